@@ -1,29 +1,53 @@
 import sys
 import os
 import tempfile
-import glob
 import requests
 import webbrowser
 import json
 import time
 import math
+import queue
+import atexit
+import bisect
+import functools
+import hashlib
+import heapq
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import (
+    ThreadPoolExecutor, CancelledError, as_completed, wait, FIRST_COMPLETED
+)
+from contextlib import contextmanager
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout,
     QLabel, QFrame, QComboBox, QMessageBox, QInputDialog, QFileDialog,
-    QTextEdit, QScrollArea, QSizePolicy, QCheckBox, QGraphicsOpacityEffect
+    QTextEdit, QScrollArea, QSizePolicy, QCheckBox, QGraphicsOpacityEffect,
+    QTableWidget, QTableWidgetItem, QHeaderView
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView
+from PyQt5.QtWebChannel import QWebChannel
 from PyQt5.QtCore import (
-    QThread, pyqtSignal, QTimer,
+    pyqtSignal, QTimer, QThreadPool, QRunnable,
     QEasingCurve, QPropertyAnimation, QParallelAnimationGroup
 )
 
 from geopy.geocoders import Nominatim
+from geopy.adapters import RequestsAdapter
+from geopy.extra.rate_limiter import RateLimiter
 import folium
-from branca.element import Element  # для вставки JS у карту
+from branca.element import MacroElement, JavascriptLink  # для вставки JS у карту
+from jinja2 import Template
 
 # Спроба імпортувати pyqtgraph (міні-графік температури)
 try:
@@ -33,6 +57,14 @@ except ImportError:
     pg = None
     HAS_PG = False
 
+# NumPy (швидка побудова просторового індексу); без нього — поелементний запасний варіант
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
 # --- Додані бібліотеки для реального пошуку ---
 from serpapi import GoogleSearch
 
@@ -43,187 +75,2167 @@ TRANSLATE_URL = "https://libretranslate.com/translate"
 
 DEFAULT_LOCATION = (50.4501, 30.5234)  # Київ, Україна
 DEFAULT_ZOOM = 6
+MAP_MOUSEMOVE_BATCH_MS = 50  # позиції mousemove з карти надсилаються пакетом раз на N мс
 APP_USER_AGENT = "py_map_weather_app_v1.7_serpapi"
+NOMINATIM_HOST = "nominatim.openstreetmap.org"
+NOMINATIM_MIN_DELAY = 1.0  # сек між запитами (usage policy Nominatim: 1 req/s)
 GEOLOCATOR_TIMEOUT = 10
 WEATHER_API_TIMEOUT = 10
+OWM_CALLS_PER_MINUTE = 50       # квота OpenWeatherMap (безкоштовний план — 60/хв)
+OWM_INTERACTIVE_RESERVE = 15    # частина квоти, яку фонові запити (дашборд, опитування) не займають
+OWM_GROUP_MAX_IDS = 20          # максимум міст в одному запиті /group
+DASHBOARD_MAX_CONCURRENCY = 6   # паралельні запити дашборду для місць без id міста
 IP_API_URL = "http://ip-api.com/json/"
+IP_API_TIMEOUT = 8
+TRANSLATE_TIMEOUT = 8
+TRANSLATE_BATCH_MAX = 50              # рядків в одному пакетному запиті
+SERPAPI_TIMEOUT = 20
+FETCH_MAX_THREADS = 4  # розмір пулу фонових мережевих запитів
+IO_MAX_WORKERS = 8     # паралельні HTTP-запити всередині однієї фонової задачі
+SEARCH_MAX_THREADS = 3  # пул SerpAPI-пошуку (AI-асистент, travel-ідеї)
+SHUTDOWN_WAIT_MS = 1500  # загальна межа очікування фонових задач при закритті вікна
+AUTO_REFRESH_ENABLED = True   # фонове опитування поточної погоди
+AUTO_REFRESH_MIN_S = 5 * 60       # інтервал, коли погода змінюється
+AUTO_REFRESH_MAX_S = 30 * 60      # стеля інтервалу при стабільній погоді
+AUTO_REFRESH_BACKOFF = 1.5        # множник інтервалу, якщо нічого не змінилось
+AUTO_REFRESH_HIDDEN_FACTOR = 4    # у скільки разів рідше, коли вікно згорнуте / приховане
+AUTO_REFRESH_TEMP_DELTA = 1.0     # °C — «помітна» зміна температури
+REFRESH_DEBOUNCE_MS = 300  # зміни локації, швидші за це, зливаються в одне оновлення
+PRIORITY_PREFETCH = 0      # пріоритети задач FetchEngine: більше — раніше
+PRIORITY_INTERACTIVE = 10
+
+# HTTP keep-alive пули: розмір пулу з'єднань на хост, повтори та пауза між ними
+HTTP_POOL_SIZES = {
+    "api.openweathermap.org": 8,
+    "nominatim.openstreetmap.org": 2,
+    "libretranslate.com": 6,
+    "ip-api.com": 1,
+    "serpapi.com": 4,
+    "tile.openstreetmap.org": 2,
+}
+HTTP_DEFAULT_POOL_SIZE = 4
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.5  # сек; пауза росте як backoff * 2^(n-1)
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) if '__file__' in locals() else os.getcwd()
+BACKGROUNDS_DIR = os.path.join(SCRIPT_DIR, "backgrounds")
+TEMP_DIR = tempfile.gettempdir()
+MAP_TEMP_FILE = os.path.join(TEMP_DIR, "map_weather_app_map.html")
+LOG_FILE = os.path.join(SCRIPT_DIR, "app_log.txt")
+LOG_LEVEL = "INFO"                    # мінімальний рівень, що потрапляє в лог
+LOG_TO_CONSOLE = True
+LOG_FLUSH_INTERVAL = 0.5              # сек між пакетними записами на диск
+LOG_BATCH_SIZE = 256                  # максимум рядків в одному записі
+LOG_MAX_BYTES = 1024 * 1024           # ротація за розміром
+LOG_ROTATE_INTERVAL = 24 * 60 * 60    # ротація за часом, сек
+LOG_BACKUP_COUNT = 3                  # app_log.txt.1 ... app_log.txt.N
+
+# телеметрія вихідних запитів: один JSON-запис на запит
+TELEMETRY_ENABLED = True
+TELEMETRY_FILE = os.path.join(SCRIPT_DIR, "requests.jsonl")
+TELEMETRY_MAX_BYTES = 5 * 1024 * 1024
+
+SUPPORTED_EXTS = [".jpg", ".jpeg", ".png", ".bmp", ".webp", ".gif"]
+BACKGROUND_KEYS = ("clear", "clouds", "rain", "storm", "snow")
+BG_SETTLE_MS = 150          # після паузи в resize фон перемальовується якісно
+BG_SCALED_CACHE_SIZE = 6    # скільки відмасштабованих фонів тримати в пам'яті
+os.makedirs(BACKGROUNDS_DIR, exist_ok=True)
+
+# файли налаштувань / улюблених
+FAV_FILE = os.path.join(SCRIPT_DIR, "favorites.json")   # старий формат, лише для міграції
+FAVORITES_DB_FILE = os.path.join(SCRIPT_DIR, "favorites.sqlite3")
+FAVORITES_COORD_PRECISION = 4   # ~11 м: точки ближче вважаються тим самим місцем
+FAVORITES_LIST_LIMIT = 500      # скільки улюблених показувати у списку (решта — через пошук)
+SETTINGS_FILE = os.path.join(SCRIPT_DIR, "settings.json")
+SETTINGS_SAVE_DELAY_MS = 2000   # зміни налаштувань за цей час записуються одним файлом
+
+# кеш відповідей OpenWeatherMap (координати округлюються до PRECISION знаків)
+WEATHER_CACHE_PRECISION = 2          # ~1.1 км
+WEATHER_CACHE_TTL = 10 * 60          # поточна погода, сек
+FORECAST_CACHE_TTL = 60 * 60         # прогноз (оновлюється раз на 3 год), сек
+WEATHER_CACHE_MAX_ENTRIES = 256
+WEATHER_CACHE_ON_DISK = True
+WEATHER_CACHE_FILE = os.path.join(SCRIPT_DIR, "weather_cache.json")
+
+# локальний кеш тайлів карти (localhost-проксі для QWebEngineView)
+TILE_CACHE_DIR = os.path.join(SCRIPT_DIR, "tile_cache")
+TILE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+TILE_DEFAULT_TTL = 7 * 24 * 60 * 60  # якщо сервер не надіслав заголовків кешування
+TILE_OFFLINE_MODE = False             # True — тайли лише з диска, без мережі
+TILE_OFFLINE_RETRY = 30               # сек без спроб мережі після збою з'єднання
+TILE_SERVER_HOST = "127.0.0.1"
+TILE_TIMEOUT = 10                     # сек на один запит тайла
+# попереднє завантаження тайлів навколо останньої переглянутої локації; вимкнено
+# за замовчуванням — usage policy tile.openstreetmap.org забороняє масове завантаження
+TILE_SEED_ENABLED = False
+TILE_SEED_ZOOMS = range(DEFAULT_ZOOM, DEFAULT_ZOOM + 5)
+TILE_SEED_RADIUS = 1                  # 1 -> квадрат 3x3 тайли навколо точки
+TILE_SEED_DELAY = 0.2                 # пауза між тайлами при попередньому завантаженні
+TILE_PROVIDERS = {
+    # id: (назва шару, URL-шаблон джерела, атрибуція)
+    "osm": (
+        "Standard",
+        "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+        "&copy; OpenStreetMap contributors",
+    ),
+    "light": (
+        "Light",
+        "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png",
+        "&copy; OpenStreetMap contributors &copy; CARTO",
+    ),
+    "dark": (
+        "Dark",
+        "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png",
+        "&copy; OpenStreetMap contributors &copy; CARTO",
+    ),
+}
+
+# профілі швидкості для оцінки часу в дорозі: (назва, км/год);
+# перевизначаються ключем "speed_profiles" у settings.json
+SPEED_PROFILES = [
+    ("Пішки", 5.0),
+    ("Велосипед", 15.0),
+    ("Авто", 50.0),
+]
+
+# найближчі улюблені до точки подвійного кліку
+NEARBY_FAVORITES_COUNT = 3
+NEARBY_FAVORITES_RADIUS_KM = 50
+
+# кеш геокодування: нормалізований запит -> (lat, lon, address)
+GEOCODE_CACHE_MAX_ENTRIES = 2000
+GEOCODE_CACHE_FILE = os.path.join(SCRIPT_DIR, "geocode_cache.json")
+
+# пам'ять перекладів: (мова-джерело, мова-ціль, хеш тексту) -> переклад
+TRANSLATION_MEMORY_FILE = os.path.join(SCRIPT_DIR, "translation_memory.sqlite3")
+TRANSLATION_MEMORY_MAX_ENTRIES = 20000
+
+# кеш відповідей SerpAPI (сирі англійські результати; переклад — при читанні через
+# пам'ять перекладів): після TTL запис ще SERPAPI_CACHE_STALE_TTL віддається
+# як застарілий, а свіжі дані тим часом довантажуються у фоні
+SERPAPI_HL = "en"
+SERPAPI_GL = "us"
+SERPAPI_CACHE_TTL = 7 * 24 * 3600
+SERPAPI_CACHE_STALE_TTL = 30 * 24 * 3600
+SERPAPI_CACHE_MAX_ENTRIES = 300
+SERPAPI_CACHE_FILE = os.path.join(SCRIPT_DIR, "serpapi_cache.json")
+
+# Стилістичні константи
+FONT_FAMILY = "Segoe UI, Arial, sans-serif"
+COLOR_PRIMARY = "#1e90ff"
+COLOR_HOVER = "#1c86ee"
+COLOR_TEXT_LIGHT = "#d6d6d6"
+COLOR_TEXT_WHITE = "#fff"
+
+
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "FATAL": 50}
+
+
+class LogWriter:
+    """
+    Фоновий запис логу: повідомлення складаються в чергу, а окремий потік
+    пише їх пакетами (раз на LOG_FLUSH_INTERVAL або по LOG_BATCH_SIZE рядків)
+    у постійно відкритий файл. Ротація — за розміром і за часом
+    (rotate_interval=None вимикає ротацію за часом).
+    """
+
+    def __init__(self, path: str = LOG_FILE, echo: bool = False,
+                 max_bytes: int = LOG_MAX_BYTES, rotate_interval=LOG_ROTATE_INTERVAL,
+                 backup_count: int = LOG_BACKUP_COUNT):
+        self.path = path
+        self.echo = echo
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._period_start = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name=f"writer-{os.path.basename(path)}", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, line: str):
+        self._queue.put(line)
+
+    def close(self):
+        """Дописати все з черги та зупинити потік (викликається при виході)."""
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        running = True
+        while running:
+            item = self._queue.get()
+            # після першого рядка збираємо решту до кінця інтервалу або до LOG_BATCH_SIZE
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            batch = []
+            while item is not None:
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= LOG_BATCH_SIZE or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                running = False
+            if batch:
+                self._write_batch(batch)
+        if self._file:
+            self._file.close()
+
+    def _write_batch(self, batch):
+        text = "\n".join(batch) + "\n"
+        if self.echo:
+            print(text, end="")
+        try:
+            self._rotate_if_needed(len(text.encode("utf-8")))
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(text)
+            self._file.flush()
+        except Exception as e:
+            print(f"ERROR: Не вдалося записати в лог-файл: {e}")
+
+    def _rotate_if_needed(self, incoming: int):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        too_big = size + incoming > self.max_bytes
+        too_old = (
+            self.rotate_interval is not None
+            and time.time() - self._period_start > self.rotate_interval
+        )
+        if not (too_big or too_old) or size == 0:
+            return
+
+        if self._file:
+            self._file.close()
+            self._file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._period_start = time.time()
+
+
+_LOG_WRITER = LogWriter(LOG_FILE, echo=LOG_TO_CONSOLE)
+atexit.register(_LOG_WRITER.close)
+
+
+def log_message(msg: str, level: str = "INFO"):
+    """
+    Логування подій у консоль і файл без блокування викликача.
+    level — один з LOG_LEVELS; префікс рівня додається при форматуванні рядка.
+    """
+    if LOG_LEVELS.get(level, 20) < LOG_LEVELS.get(LOG_LEVEL, 20):
+        return
+    timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
+    _LOG_WRITER.write(f"{timestamp} {level}: {msg}")
+
+
+# спільний виконавець для паралельних HTTP-запитів (погода + прогноз тощо)
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix="io")
+
+
+# ---------------- TELEMETRY ----------------
+_SPANS = threading.local()
+_TELEMETRY_WRITER = None
+
+
+def _telemetry_writer():
+    global _TELEMETRY_WRITER
+    if _TELEMETRY_WRITER is None:
+        _TELEMETRY_WRITER = LogWriter(
+            TELEMETRY_FILE, max_bytes=TELEMETRY_MAX_BYTES, rotate_interval=None
+        )
+        atexit.register(_TELEMETRY_WRITER.close)
+    return _TELEMETRY_WRITER
+
+
+def current_span():
+    """Поточний (найглибший) запис телеметрії у цьому потоці або None."""
+    stack = getattr(_SPANS, "stack", None)
+    return stack[-1] if stack else None
+
+
+def mark_cache(outcome: str):
+    """Позначити результат кешу для поточного запиту: hit / miss / stale."""
+    span = current_span()
+    if span is not None:
+        span["cache"] = outcome
+
+
+@contextmanager
+def request_span(endpoint: str):
+    """
+    Один виклик endpoint у телеметрії. Статус, розмір, повтори і тривалість
+    заповнює хук відповіді HttpClient: duration_ms — лише мережевий час
+    (response.elapsed), без пауз обмежувачів і локальної обробки; якщо
+    відповіді не було (влучання в кеш, помилка з'єднання), він лишається None.
+    Результат кешу позначає mark_cache().
+    """
+    span = {
+        "endpoint": endpoint,
+        "status": None,
+        "bytes": 0,
+        "retries": 0,
+        "duration_ms": None,
+        "cache": None,
+        "error": None,
+    }
+    stack = getattr(_SPANS, "stack", None)
+    if stack is None:
+        stack = _SPANS.stack = []
+    stack.append(span)
+    try:
+        yield span
+    except Exception as e:
+        span["error"] = type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        if TELEMETRY_ENABLED:
+            record = {"ts": datetime.now().isoformat(timespec="milliseconds")}
+            record.update(span)
+            _telemetry_writer().write(json.dumps(record, ensure_ascii=False))
+
+
+def instrumented(endpoint: str):
+    """Декоратор: кожен виклик функції записується в телеметрію як запит до endpoint."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with request_span(endpoint):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _annotate_span(response, *args, **kwargs):
+    """Хук requests: записати статус / розмір / повтори / мережевий час у поточний запис телеметрії."""
+    span = current_span()
+    if span is not None:
+        span["status"] = response.status_code
+        span["bytes"] += len(response.content or b"")
+        elapsed_ms = response.elapsed.total_seconds() * 1000
+        span["duration_ms"] = round((span["duration_ms"] or 0.0) + elapsed_ms, 2)
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None:
+            span["retries"] += len(retries.history)
+    return response
+
+
+def _percentile(sorted_values, pct: float):
+    """Перцентиль методом найближчого рангу."""
+    if not sorted_values:
+        return None
+    rank = max(int(math.ceil(pct / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def analyze_request_log(path: str = TELEMETRY_FILE) -> dict:
+    """
+    Зведення по endpoint: кількість викликів, мережевих запитів, p50/p95/p99
+    мережевого часу (мс; лише записи з відповіддю), помилки, влучання в кеш, байти.
+    """
+    durations = {}
+    summary = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            endpoint = rec.get("endpoint", "?")
+            st = summary.setdefault(
+                endpoint, {"count": 0, "requests": 0, "errors": 0, "cache_hits": 0, "bytes": 0}
+            )
+            st["count"] += 1
+            st["bytes"] += rec.get("bytes") or 0
+            status = rec.get("status")
+            if rec.get("error") or (status is not None and status >= 400):
+                st["errors"] += 1
+            if rec.get("cache") == "hit":
+                st["cache_hits"] += 1
+            if rec.get("duration_ms") is not None:
+                st["requests"] += 1
+                durations.setdefault(endpoint, []).append(rec["duration_ms"])
+
+    for endpoint, st in summary.items():
+        values = sorted(durations.get(endpoint, []))
+        for pct in (50, 95, 99):
+            st[f"p{pct}"] = _percentile(values, pct)
+    return summary
+
+
+def print_request_stats(path: str = TELEMETRY_FILE):
+    """Надрукувати таблицю перцентилів мережевої затримки по кожному endpoint."""
+    if not os.path.exists(path):
+        print(f"Файл телеметрії {path} ще не створено — запустіть програму з TELEMETRY_ENABLED.")
+        return
+    stats = analyze_request_log(path)
+
+    def ms(value):
+        return f"{value:>10.1f}" if value is not None else f"{'—':>10}"
+
+    print(f"{'endpoint':<28}{'calls':>7}{'net':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'errors':>8}{'cache':>7}{'KB':>9}")
+    for endpoint, st in sorted(stats.items()):
+        print(
+            f"{endpoint:<28}{st['count']:>7}{st['requests']:>7}{ms(st['p50'])}{ms(st['p95'])}"
+            f"{ms(st['p99'])}{st['errors']:>8}{st['cache_hits']:>7}{st['bytes'] / 1024:>9.1f}"
+        )
+
+
+# ---------------- HTTP: SHARED SESSIONS ----------------
+class HttpClient:
+    """
+    Спільний шар HTTP-сесій з keep-alive.
+
+    Для кожного хоста створюється одна requests.Session з власним пулом
+    з'єднань (розмір з HTTP_POOL_SIZES) та політикою повторів urllib3 Retry
+    з експоненційною паузою. Сесії потокобезпечно створюються при першому
+    зверненні та живуть до закриття програми.
+    """
+
+    def __init__(self, pool_sizes=None, retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_BACKOFF, user_agent: str = APP_USER_AGENT):
+        self.pool_sizes = dict(HTTP_POOL_SIZES if pool_sizes is None else pool_sizes)
+        self.retries = retries
+        self.backoff = backoff
+        self.user_agent = user_agent
+        self._sessions = {}  # host -> requests.Session
+        self._lock = threading.Lock()
+
+    def _make_retry(self) -> Retry:
+        return Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+
+    def session_for(self, host: str) -> requests.Session:
+        """Повертає (і за потреби створює) сесію для хоста."""
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                size = self.pool_sizes.get(host, HTTP_DEFAULT_POOL_SIZE)
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=size,
+                    max_retries=self._make_retry(),
+                )
+                session = requests.Session()
+                session.headers["User-Agent"] = self.user_agent
+                session.hooks["response"].append(_annotate_span)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session_for(urlsplit(url).hostname).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Статистика повторного використання з'єднань по хостах:
+        {host: {"requests": N, "connections": M, "reused": N - M}}.
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+
+        result = {}
+        for host, session in sessions.items():
+            requests_count = connections = 0
+            adapter = session.get_adapter("https://")
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+            result[host] = {
+                "requests": requests_count,
+                "connections": connections,
+                "reused": max(requests_count - connections, 0),
+            }
+        return result
+
+    def log_stats(self):
+        for host, st in self.stats().items():
+            log_message(
+                f"HTTP {host}: {st['requests']} запитів, "
+                f"{st['connections']} з'єднань, повторно використано {st['reused']}"
+            )
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+HTTP = HttpClient()
+
+
+class _SharedSessionGeopyAdapter(RequestsAdapter):
+    """Адаптер geopy, що ходить у мережу через спільну сесію HttpClient."""
+
+    def __init__(self, *, proxies, ssl_context):
+        super().__init__(proxies=proxies, ssl_context=ssl_context)
+        self.session.close()
+        self.session = HTTP.session_for(NOMINATIM_HOST)
+
+    def __del__(self):
+        # спільна сесія живе весь час роботи програми — не закриваємо її
+        pass
+
+
+class _PooledGoogleSearch(GoogleSearch):
+    """GoogleSearch (SerpAPI), що використовує спільну keep-alive сесію."""
+
+    def get_response(self, path="/search"):
+        url, parameter = self.construct_url(path)
+        return HTTP.get(url, params=parameter, timeout=SERPAPI_TIMEOUT)
+
+
+# ---------------- CACHING ----------------
+def atomic_write_json(path: str, data):
+    """Записує JSON через тимчасовий файл і rename — файл ніколи не буде напівзаписаним."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+PERSISTENT_CACHES = []  # кеші з дисковим шаром, які треба зберегти при виході
+
+
+class TTLCache:
+    """
+    Потокобезпечний in-memory кеш з LRU-витісненням і часом життя записів.
+
+    ttl=None означає «без терміну придатності». stale_ttl — скільки ще секунд
+    після закінчення TTL запис зберігається для get_stale() (stale-while-revalidate).
+    Якщо задано persist_path, кеш підвантажується з JSON-файлу при створенні
+    та зберігається методом save() (ключі мають бути рядками, значення —
+    JSON-сумісними).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl=None, persist_path=None, stale_ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.persist_path = persist_path
+        self._data = OrderedDict()  # key -> (expires_at | None, value)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+        if persist_path:
+            self.load()
+            PERSISTENT_CACHES.append(self)
+
+    def get(self, key, default=None):
+        value, fresh = self.get_stale(key, default)
+        return value if fresh else default
+
+    def get_stale(self, key, default=None):
+        """
+        (значення, свіже?) — прострочений запис у межах stale_ttl повертається
+        з прапорцем False; інакше (default, False).
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default, False
+            expires_at, value = entry
+            now = time.time()
+            if expires_at is not None and expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._data[key]
+                    self._dirty = True
+                    self.misses += 1
+                    return default, False
+                self._data.move_to_end(key)
+                self.misses += 1
+                return value, False
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, True
+
+    def has(self, key) -> bool:
+        """Чи є запис (свіжий або в межах stale_ttl); лічильники влучань не змінюються."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            expires_at = entry[0]
+            return expires_at is None or expires_at + self.stale_ttl > time.time()
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            self._dirty = True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._dirty = True
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._data)
+
+    def load(self):
+        """Підвантажити непрострочені записи з диска (у збереженому LRU-порядку)."""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            now = time.time()
+            with self._lock:
+                for key, expires_at, value in items[-self.max_entries:]:
+                    if expires_at is None or expires_at + self.stale_ttl > now:
+                        self._data[key] = (expires_at, value)
+            log_message(f"Кеш завантажено з {self.persist_path} ({len(self._data)} записів).")
+        except Exception as e:
+            log_message(f"Не вдалося завантажити кеш {self.persist_path}: {e}", level="ERROR")
+
+    def save(self):
+        """Зберегти кеш на диск (лише якщо були зміни)."""
+        if not self.persist_path or not self._dirty:
+            return
+        with self._lock:
+            items = [[key, exp, value] for key, (exp, value) in self._data.items()]
+            self._dirty = False
+        try:
+            atomic_write_json(self.persist_path, items)
+        except Exception as e:
+            log_message(f"Не вдалося зберегти кеш {self.persist_path}: {e}", level="ERROR")
+
+
+def save_persistent_caches():
+    for cache in PERSISTENT_CACHES:
+        cache.save()
+
+
+WEATHER_CACHE = TTLCache(
+    max_entries=WEATHER_CACHE_MAX_ENTRIES,
+    persist_path=WEATHER_CACHE_FILE if WEATHER_CACHE_ON_DISK else None,
+)
+
+
+def weather_cache_key(kind: str, lat: float, lon: float, lang=None) -> str:
+    """Ключ кешу: тип запиту + координати, округлені до WEATHER_CACHE_PRECISION, + мова."""
+    p = WEATHER_CACHE_PRECISION
+    return f"{kind}:{round(lat, p):.{p}f}:{round(lon, p):.{p}f}:{lang or 'raw'}"
+
+
+class TranslationMemory:
+    """
+    Дискова пам'ять перекладів у SQLite. Ключ — (source, target, sha1
+    нормалізованого тексту); при перевищенні max_entries видаляються записи,
+    які найдовше не використовувались. Рахує влучання/промахи.
+    """
+
+    def __init__(self, path: str = TRANSLATION_MEMORY_FILE,
+                 max_entries: int = TRANSLATION_MEMORY_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}  # (source, target, hash) -> час останнього використання
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " source TEXT NOT NULL, target TEXT NOT NULL, text_hash TEXT NOT NULL,"
+                " text TEXT NOT NULL, translation TEXT NOT NULL, last_used REAL NOT NULL,"
+                " PRIMARY KEY (source, target, text_hash))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            log_message(f"Пам'ять перекладів недоступна ({path}): {e}", level="ERROR")
+            self._conn = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @classmethod
+    def text_hash(cls, text: str) -> str:
+        return hashlib.sha1(cls.normalize(text).encode("utf-8")).hexdigest()
+
+    def get_many(self, texts, source: str, target: str) -> dict:
+        """text -> переклад для тих рядків, що вже є в пам'яті."""
+        texts = list(dict.fromkeys(texts))
+        by_hash = {}
+        for t in texts:
+            by_hash.setdefault(self.text_hash(t), []).append(t)
+        found = {}
+        # _conn перевіряється під замком: close() може виконатись з іншого потоку
+        with self._lock:
+            if self._conn is None:
+                self.misses += len(texts)
+                return {}
+            try:
+                hashes = list(by_hash)
+                for start in range(0, len(hashes), 500):
+                    chunk = hashes[start:start + 500]
+                    rows = self._conn.execute(
+                        "SELECT text_hash, translation FROM translations"
+                        f" WHERE source=? AND target=? AND text_hash IN ({','.join('?' * len(chunk))})",
+                        [source, target, *chunk],
+                    ).fetchall()
+                    now = time.time()
+                    for text_hash, translation in rows:
+                        for t in by_hash[text_hash]:
+                            found[t] = translation
+                        # last_used оновлюється пакетно при наступному записі / закритті
+                        self._touched[(source, target, text_hash)] = now
+            except sqlite3.Error as e:
+                log_message(f"Читання пам'яті перекладів: {e}", level="ERROR")
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def get(self, text: str, source: str, target: str):
+        return self.get_many([text], source, target).get(text)
+
+    def put_many(self, pairs: dict, source: str, target: str):
+        """Зберегти {text: translation} і за потреби витіснити найстаріші записи."""
+        if not pairs:
+            return
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._flush_touched()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO translations"
+                    " (source, target, text_hash, text, translation, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (source, target, self.text_hash(t), self.normalize(t), tr, now)
+                        for t, tr in pairs.items()
+                    ],
+                )
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM translations WHERE rowid IN ("
+                        " SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                log_message(f"Запис у пам'ять перекладів: {e}", level="ERROR")
+
+    def _flush_touched(self):
+        """Записати накопичені часи використання (викликати під self._lock)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE translations SET last_used=? WHERE source=? AND target=? AND text_hash=?",
+                [(ts, *key) for key, ts in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def log_stats(self):
+        st = self.stats()
+        log_message(
+            f"Пам'ять перекладів: {st['hits']} влучань, {st['misses']} промахів "
+            f"({st['hit_rate']:.0%})."
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._flush_touched()
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    log_message(f"Запис у пам'ять перекладів: {e}", level="ERROR")
+                self._conn.close()
+                self._conn = None
+
+
+# ---------------- FAVORITES STORE ----------------
+class FavoritesStore:
+    """
+    Улюблені локації в SQLite: кожна зміна — окрема транзакція (додавання /
+    видалення одного рядка замість перезапису всього файлу), пошук за назвою
+    і префіксом через індекс, теги в окремій таблиці. Дублікати (та сама точка
+    з точністю FAVORITES_COORD_PRECISION) не створюються — запис оновлюється.
+    Улюблене повертається як dict: id, name, lat, lon, tags, owm_id.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str = FAVORITES_DB_FILE, legacy_json: str = FAV_FILE):
+        self.path = path
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS favorites ("
+                    " id INTEGER PRIMARY KEY, name TEXT NOT NULL, name_key TEXT NOT NULL,"
+                    " lat REAL NOT NULL, lon REAL NOT NULL, coord_key TEXT NOT NULL UNIQUE,"
+                    " owm_id INTEGER, created REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_favorites_name_key ON favorites(name_key)"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS favorite_tags ("
+                    " favorite_id INTEGER NOT NULL REFERENCES favorites(id) ON DELETE CASCADE,"
+                    " tag TEXT NOT NULL, PRIMARY KEY (favorite_id, tag))"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_favorite_tags_tag ON favorite_tags(tag)"
+                )
+            (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            if version < self.SCHEMA_VERSION:
+                self._migrate_json(legacy_json)
+                self._conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+        except sqlite3.Error as e:
+            log_message(f"Сховище улюблених недоступне ({path}): {e}", level="ERROR")
+            self._conn = None
+
+    @staticmethod
+    def name_key(name: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", name).split()).casefold()
+
+    @staticmethod
+    def coord_key(lat: float, lon: float) -> str:
+        return f"{lat:.{FAVORITES_COORD_PRECISION}f},{lon:.{FAVORITES_COORD_PRECISION}f}"
+
+    @staticmethod
+    def normalize_tags(tags) -> list:
+        return sorted({t.strip().lstrip("#").casefold() for t in tags or () if t.strip("# ")})
+
+    def _migrate_json(self, path: str):
+        """Одноразовий імпорт favorites.json (файл не змінюється і далі не використовується)."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            log_message(f"Не вдалося прочитати {path} для міграції: {e}", level="ERROR")
+            return
+        count = 0
+        with self._conn:
+            for item in items:
+                try:
+                    self._upsert(item["name"], float(item["lat"]), float(item["lon"]),
+                                 item.get("tags"), item.get("owm_id"))
+                    count += 1
+                except (KeyError, TypeError, ValueError):
+                    log_message(f"Пропущено некоректне улюблене під час міграції: {item}", level="WARNING")
+        log_message(f"Перенесено {count} улюблених з {os.path.basename(path)} у SQLite.")
+
+    def _upsert(self, name: str, lat: float, lon: float, tags=None, owm_id=None):
+        """
+        Вставити або оновити запис з тими ж координатами (викликати в транзакції).
+        tags=None лишає теги наявного запису, список — повністю замінює їх.
+        """
+        name = " ".join(name.split())
+        coord_key = self.coord_key(lat, lon)
+        row = self._conn.execute(
+            "SELECT id FROM favorites WHERE coord_key=?", (coord_key,)
+        ).fetchone()
+        if row:
+            fav_id, created = row[0], False
+            self._conn.execute(
+                "UPDATE favorites SET name=?, name_key=?, owm_id=COALESCE(?, owm_id) WHERE id=?",
+                (name, self.name_key(name), owm_id, fav_id),
+            )
+        else:
+            created = True
+            fav_id = self._conn.execute(
+                "INSERT INTO favorites (name, name_key, lat, lon, coord_key, owm_id, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, self.name_key(name), lat, lon, coord_key, owm_id, time.time()),
+            ).lastrowid
+        if tags is not None:
+            self._conn.execute("DELETE FROM favorite_tags WHERE favorite_id=?", (fav_id,))
+            self._conn.executemany(
+                "INSERT INTO favorite_tags (favorite_id, tag) VALUES (?, ?)",
+                [(fav_id, tag) for tag in self.normalize_tags(tags)],
+            )
+        return fav_id, created
+
+    def _rows(self, where: str = "", params=(), limit=None) -> list:
+        if self._conn is None:
+            return []
+        sql = (
+            "SELECT f.id, f.name, f.lat, f.lon, f.owm_id,"
+            " (SELECT group_concat(tag, ',') FROM favorite_tags t WHERE t.favorite_id = f.id)"
+            f" FROM favorites f {where} ORDER BY f.name_key, f.id"
+        )
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        try:
+            rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            log_message(f"Читання улюблених: {e}", level="ERROR")
+            return []
+        return [
+            {
+                "id": fav_id, "name": name, "lat": lat, "lon": lon,
+                "tags": sorted(tags.split(",")) if tags else [],
+                **({"owm_id": owm_id} if owm_id else {}),
+            }
+            for fav_id, name, lat, lon, owm_id, tags in rows
+        ]
+
+    def all(self, limit=None) -> list:
+        return self._rows(limit=limit)
+
+    def get(self, fav_id: int):
+        rows = self._rows("WHERE f.id=?", (fav_id,))
+        return rows[0] if rows else None
+
+    def __len__(self):
+        if self._conn is None:
+            return 0
+        return self._conn.execute("SELECT COUNT(*) FROM favorites").fetchone()[0]
+
+    def add(self, name: str, lat: float, lon: float, tags=None):
+        """
+        (улюблене, True) — новий запис; (улюблене, False) — оновлено наявний у цій
+        точці. Теги: None — без змін, список — новий набір тегів.
+        """
+        if self._conn is None:
+            return None, False
+        try:
+            with self._conn:
+                fav_id, created = self._upsert(name, lat, lon, tags)
+        except sqlite3.Error as e:
+            log_message(f"Не вдалося зберегти улюблене: {e}", level="ERROR")
+            return None, False
+        return self.get(fav_id), created
+
+    def remove(self, fav_id: int) -> bool:
+        if self._conn is None:
+            return False
+        try:
+            with self._conn:
+                cur = self._conn.execute("DELETE FROM favorites WHERE id=?", (fav_id,))
+        except sqlite3.Error as e:
+            log_message(f"Не вдалося видалити улюблене: {e}", level="ERROR")
+            return False
+        return cur.rowcount > 0
+
+    def set_owm_ids(self, mapping: dict):
+        """Запам'ятати id міст OpenWeatherMap: {id улюбленого: id міста} однією транзакцією."""
+        if self._conn is None or not mapping:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE favorites SET owm_id=? WHERE id=?",
+                    [(owm_id, fav_id) for fav_id, owm_id in mapping.items()],
+                )
+        except sqlite3.Error as e:
+            log_message(f"Не вдалося зберегти id міст улюблених: {e}", level="ERROR")
+
+    def search(self, prefix: str, limit=FAVORITES_LIST_LIMIT) -> list:
+        """Пошук за початком назви (діапазон по індексу name_key); «#тег» — за тегом."""
+        prefix = prefix.strip()
+        if prefix.startswith("#"):
+            tags = self.normalize_tags([prefix])
+            if not tags:
+                return self.all(limit)
+            return self._rows(
+                "WHERE f.id IN (SELECT favorite_id FROM favorite_tags WHERE tag=?)", tags, limit
+            )
+        key = self.name_key(prefix)
+        if not key:
+            return self.all(limit)
+        return self._rows(
+            "WHERE f.name_key >= ? AND f.name_key < ?", (key, key + "\U0010ffff"), limit
+        )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ---------------- SETTINGS STORE ----------------
+class SettingsStore(QtCore.QObject):
+    """
+    settings.json з відкладеним записом: update() лише позначає зміни, а
+    файл записується (атомарно, через atomic_write_json) не раніше ніж за
+    delay_ms після першої незбереженої зміни — всі зміни за цей час ідуть
+    одним записом. Якщо значення не змінились, запису немає зовсім.
+    flush() записує негайно (виклик при закритті програми).
+    """
+
+    def __init__(self, path: str = SETTINGS_FILE, delay_ms: int = SETTINGS_SAVE_DELAY_MS,
+                 parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.data = {}
+        self.dirty = False
+        self.writes = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def load(self) -> dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+                log_message("Налаштування успішно завантажені.")
+            except Exception as e:
+                log_message(f"Не вдалося завантажити налаштування: {e}", level="ERROR")
+                self.data = {}
+        return self.data
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    def update(self, **values):
+        """Змінити значення; запис планується, лише якщо щось справді змінилось."""
+        changed = {k: v for k, v in values.items() if self.data.get(k, object()) != v}
+        if not changed:
+            return
+        self.data.update(changed)
+        self.dirty = True
+        # таймер не перезапускається: потік змін не відкладає запис безкінечно
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        if not self.dirty:
+            return
+        try:
+            atomic_write_json(self.path, self.data)
+            self.dirty = False
+            self.writes += 1
+            log_message("Налаштування збережено.")
+        except Exception as e:
+            log_message(f"Не вдалося зберегти налаштування: {e}", level="ERROR")
+
+
+# ---------------- HELPERS: BACKGROUNDS ----------------
+class BackgroundManager:
+    """
+    Лінивий каталог фонових зображень.
+
+    BACKGROUNDS_DIR сканується один раз (один прохід os.scandir) при першому
+    зверненні. Кожне зображення декодується в QPixmap лише раз, а масштабовані
+    версії кешуються за цільовим розміром (LRU на BG_SCALED_CACHE_SIZE записів).
+    """
+
+    def __init__(self, directory: str = BACKGROUNDS_DIR):
+        self.directory = directory
+        self._images = None          # key -> шлях (після сканування)
+        self._pixmaps = {}           # шлях -> QPixmap | None (не вдалося декодувати)
+        self._scaled = OrderedDict()  # (шлях, w, h) -> QPixmap
+
+    def _scan(self):
+        if self._images is not None:
+            return
+        self._images = {}
+        candidates = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if ext in SUPPORTED_EXTS and entry.is_file():
+                        candidates.append((SUPPORTED_EXTS.index(ext), entry.name, entry.path))
+        except OSError as e:
+            log_message(f"Не вдалося прочитати теку фонів '{self.directory}': {e}", level="ERROR")
+
+        # пріоритет як у попередній версії: спершу за розширенням, потім за назвою
+        for _ext_rank, name, path in sorted(candidates):
+            for key in BACKGROUND_KEYS:
+                if name.startswith(key) and key not in self._images:
+                    self._images[key] = path
+
+        self._images["default"] = self._images.get("clear") or next(
+            (self._images[k] for k in BACKGROUND_KEYS if self._images.get(k)), None
+        )
+        if self._images["default"]:
+            log_message(f"Знайдено фонів: {len(self._images) - 1} у '{self.directory}'.")
+        else:
+            log_message(
+                f"Жодного фонового зображення за замовчуванням не знайдено у '{self.directory}'.", level="WARNING"
+            )
+
+    def find(self, key: str):
+        """Шлях до фону для ключа (clear, clouds, rain, snow, storm, default) або None."""
+        self._scan()
+        return self._images.get(key)
+
+    @property
+    def default(self):
+        return self.find("default")
+
+    def for_description(self, desc: str):
+        """Обирає фон за описом погоди з OpenWeatherMap (english description)."""
+        w = (desc or "").lower()
+        if "thunder" in w or "storm" in w:
+            return self.find("storm") or self.find("rain") or self.default
+        if "rain" in w or "drizzle" in w or "shower" in w:
+            return self.find("rain") or self.default
+        if "snow" in w or "sleet" in w or "ice" in w:
+            return self.find("snow") or self.default
+        if "cloud" in w or "overcast" in w or "broken" in w or "scattered" in w or "mist" in w or "fog" in w:
+            return self.find("clouds") or self.default
+        if "clear" in w or "sun" in w:
+            return self.find("clear") or self.default
+        return self.default
+
+    def pixmap(self, path: str):
+        """Декодований QPixmap (один раз на файл) або None."""
+        if path not in self._pixmaps:
+            pix = QtGui.QPixmap(path) if os.path.exists(path) else QtGui.QPixmap()
+            if pix.isNull():
+                log_message(f"QPixmap не змогла завантажити файл: {path}.", level="ERROR")
+                pix = None
+            self._pixmaps[path] = pix
+        return self._pixmaps[path]
+
+    def scaled(self, path: str, size: QtCore.QSize, smooth: bool = True):
+        """
+        Фон, відмасштабований під size. Якісні (smooth) версії кешуються;
+        швидкі (під час живого resize) — ні, бо розмір щоразу інший.
+        """
+        pix = self.pixmap(path)
+        if pix is None:
+            return None
+
+        key = (path, size.width(), size.height())
+        if smooth:
+            cached = self._scaled.get(key)
+            if cached is not None:
+                self._scaled.move_to_end(key)
+                return cached
+
+        mode = QtCore.Qt.SmoothTransformation if smooth else QtCore.Qt.FastTransformation
+        result = pix.scaled(size, QtCore.Qt.KeepAspectRatioByExpanding, mode)
+        if smooth:
+            self._scaled[key] = result
+            while len(self._scaled) > BG_SCALED_CACHE_SIZE:
+                self._scaled.popitem(last=False)
+        return result
+
+
+BACKGROUNDS = BackgroundManager()
+
+
+def find_background_for(key: str):
+    """Пошук фонового зображення по ключу (clear, clouds, rain, snow, storm)."""
+    return BACKGROUNDS.find(key)
+
+
+def choose_background_by_description(desc: str):
+    """Обирає фон за описом погоди з OpenWeatherMap (english description)."""
+    return BACKGROUNDS.for_description(desc)
+
+
+# ---------------- DISTANCE HELPERS (дві мітки + шлях) ----------------
+EARTH_RADIUS_M = 6371000.0  # радіус Землі в метрах
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Формула гаверсина: відстань (м) між двома точками в градусах."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    a = min(max(a, 0.0), 1.0)
+    return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Обчислює відстань між двома точками (lat/lon у градусах)
+    за формулою гаверсина. Повертає (метри, кілометри).
+    """
+    d_m = _haversine(lat1, lon1, lat2, lon2)
+    return d_m, d_m / 1000.0
+
+
+def _unit_vector(lat: float, lon: float):
+    phi, lam = math.radians(lat), math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def _chord_to_km(chord: float) -> float:
+    """Довжина хорди одиничної сфери -> відстань по великому колу (км)."""
+    return 2 * math.asin(min(chord / 2, 1.0)) * EARTH_RADIUS_M / 1000.0
+
+
+def _km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km * 1000.0 / EARTH_RADIUS_M, math.pi) / 2)
+
+
+class SpatialIndex:
+    """
+    k-d дерево над точками як одиничними 3D-векторами на сфері: евклідова
+    відстань між ними (хорда) монотонна з відстанню по великому колу, тож
+    немає проблем із 180-м меридіаном і полюсами. Листки по LEAF_SIZE точок,
+    у кожного вузла — обмежувальний паралелепіпед для відсікання гілок.
+
+    Запити: nearest(lat, lon, n) і within(lat, lon, radius_km) повертають
+    [(відстань_км, payload), ...] за зростанням відстані.
+    Побудова прискорюється NumPy (якщо встановлено). add() додає точку без
+    перебудови: до LEAF_SIZE нових точок переглядаються перебором.
+    """
+
+    LEAF_SIZE = 16
+
+    def __init__(self, points, payloads=None):
+        points = list(points)
+        self.payloads = list(payloads) if payloads is not None else list(points)
+        self._points = points
+        self._build(points)
+
+    def _build(self, points):
+        # вузол: [lo, hi, (min_x, min_y, min_z), (max_x, max_y, max_z), left, right]
+        self._nodes = []
+        if HAS_NUMPY and points:
+            self._build_numpy(points)
+        else:
+            self._build_python(points)
+        # позиції _xyz від _tree_size і далі — додані через add(), поза деревом
+        self._tree_size = len(self._xyz)
+
+    def add(self, lat: float, lon: float, payload=None):
+        """Додати одну точку; коли доданих більше LEAF_SIZE — дерево перебудовується."""
+        self._points.append((lat, lon))
+        self.payloads.append(payload if payload is not None else (lat, lon))
+        if len(self._points) - self._tree_size > self.LEAF_SIZE:
+            self._build(self._points)
+        else:
+            self._xyz.append(_unit_vector(lat, lon))
+            self._ids.append(len(self.payloads) - 1)
+
+    @classmethod
+    def from_places(cls, places):
+        """Індекс над словниками з ключами lat / lon (улюблені, імпортовані списки місць)."""
+        places = [p for p in places if "lat" in p and "lon" in p]
+        return cls([(p["lat"], p["lon"]) for p in places], places)
+
+    def __len__(self):
+        return len(self._xyz)
+
+    # ---------- побудова ----------
+    def _build_numpy(self, points):
+        latlon = np.radians(np.asarray(points, dtype="float64").reshape(-1, 2))
+        cos_phi = np.cos(latlon[:, 0])
+        xyz = np.column_stack(
+            (cos_phi * np.cos(latlon[:, 1]), cos_phi * np.sin(latlon[:, 1]), np.sin(latlon[:, 0]))
+        )
+        order = np.arange(len(xyz))
+        stack = [(0, len(xyz), None, 0)]
+        while stack:
+            lo, hi, parent, side = stack.pop()
+            block = xyz[order[lo:hi]]
+            mn, mx = block.min(axis=0), block.max(axis=0)
+            node = self._add_node(lo, hi, tuple(mn.tolist()), tuple(mx.tolist()), parent, side)
+            if hi - lo > self.LEAF_SIZE:
+                axis = int(np.argmax(mx - mn))
+                mid = (lo + hi) // 2
+                part = np.argpartition(block[:, axis], mid - lo)
+                order[lo:hi] = order[lo:hi][part]
+                stack.append((mid, hi, node, 5))
+                stack.append((lo, mid, node, 4))
+        self._xyz = [tuple(v) for v in xyz[order].tolist()]
+        self._ids = order.tolist()
+
+    def _build_python(self, points):
+        items = [(_unit_vector(lat, lon), i) for i, (lat, lon) in enumerate(points)]
+        stack = [(0, len(items), None, 0)] if items else []
+        while stack:
+            lo, hi, parent, side = stack.pop()
+            block = items[lo:hi]
+            mn = tuple(min(v[0][k] for v in block) for k in range(3))
+            mx = tuple(max(v[0][k] for v in block) for k in range(3))
+            node = self._add_node(lo, hi, mn, mx, parent, side)
+            if hi - lo > self.LEAF_SIZE:
+                axis = max(range(3), key=lambda k: mx[k] - mn[k])
+                items[lo:hi] = sorted(block, key=lambda v: v[0][axis])
+                mid = (lo + hi) // 2
+                stack.append((mid, hi, node, 5))
+                stack.append((lo, mid, node, 4))
+        self._xyz = [v for v, _ in items]
+        self._ids = [i for _, i in items]
+
+    def _add_node(self, lo, hi, mn, mx, parent, side):
+        self._nodes.append([lo, hi, mn, mx, -1, -1])
+        index = len(self._nodes) - 1
+        if parent is not None:
+            self._nodes[parent][side] = index
+        return index
+
+    # ---------- запити ----------
+    @staticmethod
+    def _box_dist2(q, mn, mx):
+        """Квадрат мінімальної відстані від точки до паралелепіпеда."""
+        d2 = 0.0
+        for k in range(3):
+            if q[k] < mn[k]:
+                d2 += (mn[k] - q[k]) ** 2
+            elif q[k] > mx[k]:
+                d2 += (q[k] - mx[k]) ** 2
+        return d2
+
+    def _scan_nearest(self, best, n, q, lo, hi):
+        """Перебір позицій lo..hi з оновленням max-купи best (-d2, id) розміру n."""
+        qx, qy, qz = q
+        for pos in range(lo, hi):
+            x, y, z = self._xyz[pos]
+            d2 = (x - qx) ** 2 + (y - qy) ** 2 + (z - qz) ** 2
+            if len(best) < n:
+                heapq.heappush(best, (-d2, self._ids[pos]))
+            elif d2 < -best[0][0]:
+                heapq.heapreplace(best, (-d2, self._ids[pos]))
+
+    def nearest(self, lat: float, lon: float, n: int = 1):
+        """n найближчих точок: [(км, payload), ...]."""
+        if not self._xyz or n <= 0:
+            return []
+        q = _unit_vector(lat, lon)
+        best = []  # max-купа (-d2, id) розміру n
+        self._scan_nearest(best, n, q, self._tree_size, len(self._xyz))
+        frontier = [(0.0, 0)] if self._nodes else []
+        while frontier:
+            bound, index = heapq.heappop(frontier)
+            if len(best) == n and bound >= -best[0][0]:
+                break
+            lo, hi, _, _, left, right = self._nodes[index]
+            if left < 0:
+                self._scan_nearest(best, n, q, lo, hi)
+                continue
+            for child in (left, right):
+                node = self._nodes[child]
+                heapq.heappush(frontier, (self._box_dist2(q, node[2], node[3]), child))
+        return [
+            (_chord_to_km(math.sqrt(-neg_d2)), self.payloads[i])
+            for neg_d2, i in sorted(best, reverse=True)
+        ]
+
+    def _scan_within(self, found, r2, q, lo, hi):
+        qx, qy, qz = q
+        for pos in range(lo, hi):
+            x, y, z = self._xyz[pos]
+            d2 = (x - qx) ** 2 + (y - qy) ** 2 + (z - qz) ** 2
+            if d2 <= r2:
+                found.append((d2, self._ids[pos]))
+
+    def within(self, lat: float, lon: float, radius_km: float):
+        """Усі точки в радіусі radius_km: [(км, payload), ...]."""
+        if not self._xyz:
+            return []
+        q = _unit_vector(lat, lon)
+        r2 = _km_to_chord(radius_km) ** 2
+        found = []
+        self._scan_within(found, r2, q, self._tree_size, len(self._xyz))
+        stack = [0] if self._nodes else []
+        while stack:
+            lo, hi, mn, mx, left, right = self._nodes[stack.pop()]
+            if self._box_dist2(q, mn, mx) > r2:
+                continue
+            if left < 0:
+                self._scan_within(found, r2, q, lo, hi)
+            else:
+                stack.append(left)
+                stack.append(right)
+        found.sort()
+        return [(_chord_to_km(math.sqrt(d2)), self.payloads[i]) for d2, i in found]
+
+
+def format_travel_time(distance_km: float, speed_kmh: float) -> str:
+    """
+    Форматує час у вигляді 'X год Y хв' для заданої відстані (км)
+    та швидкості (км/год).
+    """
+    if speed_kmh <= 0:
+        return "—"
+
+    hours = distance_km / speed_kmh
+    total_minutes = int(round(hours * 60))
+    h = total_minutes // 60
+    m = total_minutes % 60
+
+    if h == 0:
+        return f"{m} хв"
+    return f"{h} год {m} хв"
+
+
+def format_profile_times(distance_km: float, profiles=SPEED_PROFILES) -> list:
+    """Рядки «Назва (~N км/год): час» для кожного профілю швидкості."""
+    return [
+        f"{name} (~{speed:g} км/год): {format_travel_time(distance_km, speed)}"
+        for name, speed in profiles
+    ]
+
+
+class RouteMeasurement:
+    """
+    Маршрут із N точок. cumulative[i] — відстань (м) від першої точки до i-ї,
+    тож додавання та скасування точки — O(1), а відстань між будь-якими
+    двома точками маршруту — різниця двох накопичених значень.
+    """
+
+    def __init__(self):
+        self.points = []
+        self.cumulative = []
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, lat: float, lon: float) -> float:
+        """Додати точку; повертає довжину нового відрізка (м)."""
+        segment = _haversine(*self.points[-1], lat, lon) if self.points else 0.0
+        self.points.append((lat, lon))
+        self.cumulative.append((self.cumulative[-1] if self.cumulative else 0.0) + segment)
+        return segment
+
+    def undo(self):
+        """Прибрати останню точку (повертає її або None)."""
+        if not self.points:
+            return None
+        self.cumulative.pop()
+        return self.points.pop()
+
+    def clear(self):
+        self.points.clear()
+        self.cumulative.clear()
+
+    @property
+    def total_m(self) -> float:
+        return self.cumulative[-1] if self.cumulative else 0.0
+
+    def segment_m(self, index: int) -> float:
+        """Довжина відрізка, що закінчується в точці index (м)."""
+        return self.cumulative[index] - self.cumulative[index - 1] if index > 0 else 0.0
+
+    def distance_between(self, i: int, j: int) -> float:
+        return abs(self.cumulative[j] - self.cumulative[i])
+
+
+# ---------------- MAP TILE CACHE ----------------
+def tile_for(lat: float, lon: float, zoom: int):
+    """Номер тайла (x, y) Web Mercator для точки на масштабі zoom."""
+    n = 2 ** zoom
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_expiry_from_headers(headers, now: float):
+    """
+    Час, до якого тайл свіжий, за Cache-Control / Expires.
+    None — сервер заборонив зберігання (no-store).
+    """
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    for part in cache_control.split(","):
+        part = part.strip()
+        if part.startswith("max-age="):
+            try:
+                return now + int(part.split("=", 1)[1])
+            except ValueError:
+                break
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return now + TILE_DEFAULT_TTL
+
+
+class TileCache:
+    """
+    Дисковий кеш тайлів з LRU-витісненням за сумарним розміром.
+
+    Тайли лежать у directory/<provider>/<z>/<x>/<y>.png, а термін свіжості
+    та ETag / Last-Modified — в index.json. Прострочені тайли
+    перевіряються умовним запитом. Якщо мережа недоступна, віддається
+    застаріла копія (офлайн-режим).
+    """
+
+    def __init__(self, directory: str = TILE_CACHE_DIR, max_bytes: int = TILE_CACHE_MAX_BYTES,
+                 offline: bool = TILE_OFFLINE_MODE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.index_path = os.path.join(directory, "index.json")
+        self._index = OrderedDict()  # "provider/z/x/y" -> {"size", "expires", "etag", "last_modified"}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._offline_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split("/")) + ".png"
+
+    def _load_index(self):
+        """Зібрати індекс з диска (порядок LRU — за часом останньої зміни файлу)."""
+        meta = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except Exception as e:
+                log_message(f"Не вдалося прочитати індекс тайлів: {e}", level="ERROR")
+
+        found = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".png") or name.startswith(".tmp_"):
+                    continue
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, self.directory)[:-4].replace(os.sep, "/")
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, key, st.st_size))
+
+        for _mtime, key, size in sorted(found):
+            entry = {"expires": 0, "etag": None, "last_modified": None}
+            entry.update(meta.get(key, {}))
+            entry["size"] = size
+            self._index[key] = entry
+            self._total_bytes += size
+
+    def save_index(self):
+        with self._lock:
+            data = {
+                key: {k: v for k, v in entry.items() if k != "size"}
+                for key, entry in self._index.items()
+            }
+        try:
+            atomic_write_json(self.index_path, data)
+        except Exception as e:
+            log_message(f"Не вдалося зберегти індекс тайлів: {e}", level="ERROR")
+
+    def is_fresh(self, provider: str, z: int, x: int, y: int) -> bool:
+        entry = self._index.get(f"{provider}/{z}/{x}/{y}")
+        return bool(entry) and entry["expires"] > time.time()
+
+    def get_tile(self, provider: str, z: int, x: int, y: int):
+        """
+        Повертає (bytes, max_age_сек) або (None, 0), якщо тайла немає ні в кеші,
+        ні в мережі.
+        """
+        key = f"{provider}/{z}/{x}/{y}"
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                self._index.move_to_end(key)
+                entry = dict(entry)
+
+        if entry is not None and entry["expires"] > now:
+            content = self._read(key)
+            if content is not None:
+                self._count("hits")
+                return content, int(entry["expires"] - now)
+
+        if self.offline or now < self._offline_until:
+            return self._stale_or_none(key, entry)
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        _name, template, _attr = TILE_PROVIDERS[provider]
+        url = template.format(s="abc"[(x + y) % 3], z=z, x=x, y=y)
+        try:
+            r = HTTP.get(url, headers=headers, timeout=TILE_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            if now >= self._offline_until:
+                log_message(
+                    f"Тайли недоступні ({e}); переходжу в офлайн на {TILE_OFFLINE_RETRY} с.",
+                    level="WARNING",
+                )
+            self._offline_until = now + TILE_OFFLINE_RETRY
+            return self._stale_or_none(key, entry)
+
+        if r.status_code == 304 and entry is not None:
+            content = self._read(key)
+            if content is not None:
+                expires = tile_expiry_from_headers(r.headers, now) or now
+                self._update_meta(key, expires=expires)
+                self._count("hits")
+                return content, int(expires - now)
+
+        if r.status_code != 200:
+            return self._stale_or_none(key, entry)
+
+        self._count("misses")
+        expires = tile_expiry_from_headers(r.headers, now)
+        if expires is not None:
+            self._store(key, r.content, expires, r.headers)
+            return r.content, int(expires - now)
+        return r.content, 0
+
+    def _stale_or_none(self, key: str, entry):
+        if entry is not None:
+            content = self._read(key)
+            if content is not None:
+                self._count("stale")
+                return content, 0
+        return None, 0
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _read(self, key: str):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                entry = self._index.pop(key, None)
+                if entry is not None:
+                    self._total_bytes -= entry["size"]
+            return None
+
+    def _update_meta(self, key: str, **values):
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is not None:
+                entry.update(values)
+
+    def _store(self, key: str, content: bytes, expires: float, headers):
+        path = self._path(key)
+        try:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # унікальне тимчасове ім'я: сервер і seed-потік можуть писати той самий тайл
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".png", dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except OSError:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            log_message(f"Не вдалося зберегти тайл {key}: {e}", level="ERROR")
+            return
 
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) if '__file__' in locals() else os.getcwd()
-BACKGROUNDS_DIR = os.path.join(SCRIPT_DIR, "backgrounds")
-TEMP_DIR = tempfile.gettempdir()
-MAP_TEMP_FILE = os.path.join(TEMP_DIR, "map_weather_app_map.html")
-LOG_FILE = os.path.join(SCRIPT_DIR, "app_log.txt")
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old["size"]
+            self._index[key] = {
+                "size": len(content),
+                "expires": expires,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+            }
+            self._total_bytes += len(content)
+            self._evict_locked()
 
-SUPPORTED_EXTS = [".jpg", ".jpeg", ".png", ".bmp", ".webp", ".gif"]
-os.makedirs(BACKGROUNDS_DIR, exist_ok=True)
+    def _evict_locked(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key, entry = self._index.popitem(last=False)
+            self._total_bytes -= entry["size"]
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def seed_around(self, points, provider: str = "osm", zooms=TILE_SEED_ZOOMS,
+                    radius: int = TILE_SEED_RADIUS, stop_event=None):
+        """Попередньо завантажити тайли навколо точек [(lat, lon), ...] (пропускаючи свіжі)."""
+        fetched = 0
+        for lat, lon in points:
+            for z in zooms:
+                cx, cy = tile_for(lat, lon, z)
+                n = 2 ** z
+                for x in range(cx - radius, cx + radius + 1):
+                    for y in range(cy - radius, cy + radius + 1):
+                        if stop_event is not None and stop_event.is_set():
+                            return fetched
+                        if not (0 <= x < n and 0 <= y < n) or self.is_fresh(provider, z, x, y):
+                            continue
+                        if self.offline or time.time() < self._offline_until:
+                            return fetched
+                        self.get_tile(provider, z, x, y)
+                        fetched += 1
+                        time.sleep(TILE_SEED_DELAY)
+        return fetched
+
+
+class _TileRequestHandler(BaseHTTPRequestHandler):
+    """GET /tiles/<provider>/<z>/<x>/<y>.png -> тайл з TileCache."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        try:
+            _, provider, z, x, y = parts
+            z, x, y = int(z), int(x), int(y.rsplit(".", 1)[0])
+            if parts[0] != "tiles" or provider not in TILE_PROVIDERS:
+                raise ValueError(self.path)
+        except ValueError:
+            self._reply(404, b"", 0)
+            return
 
-# файли налаштувань / улюблених
-FAV_FILE = os.path.join(SCRIPT_DIR, "favorites.json")
-SETTINGS_FILE = os.path.join(SCRIPT_DIR, "settings.json")
+        content, max_age = self.server.tile_cache.get_tile(provider, z, x, y)
+        if content is None:
+            self._reply(504, b"", 0)
+        else:
+            self._reply(200, content, max_age)
 
-# Стилістичні константи
-FONT_FAMILY = "Segoe UI, Arial, sans-serif"
-COLOR_PRIMARY = "#1e90ff"
-COLOR_HOVER = "#1c86ee"
-COLOR_TEXT_LIGHT = "#d6d6d6"
-COLOR_TEXT_WHITE = "#fff"
+    def _reply(self, status: int, body: bytes, max_age: int):
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", f"max-age={max(max_age, 0)}")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
 
+    def log_message(self, format, *args):
+        pass  # не засмічуємо консоль запитами кожного тайла
 
-def log_message(msg: str):
-    """Проста функція логування для відстеження подій у консолі та файлі."""
-    timestamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-    log_entry = f"{timestamp} {msg}"
-    print(log_entry)
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_entry + "\n")
-    except Exception as e:
-        print(f"ERROR: Не вдалося записати в лог-файл: {e}")
 
+class TileServer:
+    """Локальний HTTP-сервер тайлів для QWebEngineView (працює у фоновому потоці)."""
 
-# ---------------- HELPERS: BACKGROUNDS ----------------
-def find_background_for(key: str):
-    """Пошук фонового зображення по ключу (clear, clouds, rain, snow, storm)."""
-    log_message(f"INFO: Шукаю фон для ключа: {key}")
-    for ext in SUPPORTED_EXTS:
-        filename_pattern = os.path.join(BACKGROUNDS_DIR, f"{key}*{ext}")
-        files = glob.glob(filename_pattern)
-        if files:
-            log_message(f"INFO: Знайдено фон: {files[0]} для ключа '{key}'")
-            return files[0]
-    log_message(f"WARNING: Фон для ключа '{key}' не знайдено в '{BACKGROUNDS_DIR}'.")
-    return None
-
-
-BACKGROUND_IMAGES = {
-    "clear": find_background_for("clear"),
-    "clouds": find_background_for("clouds"),
-    "rain": find_background_for("rain"),
-    "storm": find_background_for("storm"),
-    "snow": find_background_for("snow"),
-}
-BACKGROUND_IMAGES["default"] = BACKGROUND_IMAGES.get("clear") or next(
-    (f for f in BACKGROUND_IMAGES.values() if f), None
-)
-if not BACKGROUND_IMAGES["default"]:
-    log_message(
-        f"WARNING: Жодного фонового зображення за замовчуванням не знайдено у '{BACKGROUNDS_DIR}'."
-    )
+    def __init__(self, cache: TileCache):
+        self.cache = cache
+        self._server = None
+        self._thread = None
+        self._seed_stop = threading.Event()
 
+    @property
+    def running(self) -> bool:
+        return self._server is not None
 
-def choose_background_by_description(desc: str):
-    """Обирає фон за описом погоди з OpenWeatherMap (english description)."""
-    w = (desc or "").lower()
-    if "thunder" in w or "storm" in w:
-        return BACKGROUND_IMAGES.get("storm") or BACKGROUND_IMAGES.get("rain") or BACKGROUND_IMAGES["default"]
-    if "rain" in w or "drizzle" in w or "shower" in w:
-        return BACKGROUND_IMAGES.get("rain") or BACKGROUND_IMAGES["default"]
-    if "snow" in w or "sleet" in w or "ice" in w:
-        return BACKGROUND_IMAGES.get("snow") or BACKGROUND_IMAGES["default"]
-    if "cloud" in w or "overcast" in w or "broken" in w or "scattered" in w or "mist" in w or "fog" in w:
-        return BACKGROUND_IMAGES.get("clouds") or BACKGROUND_IMAGES["default"]
-    if "clear" in w or "sun" in w:
-        return BACKGROUND_IMAGES.get("clear") or BACKGROUND_IMAGES["default"]
-    return BACKGROUND_IMAGES["default"]
+    def start(self) -> bool:
+        try:
+            self._server = ThreadingHTTPServer((TILE_SERVER_HOST, 0), _TileRequestHandler)
+        except OSError as e:
+            log_message(f"Не вдалося запустити локальний сервер тайлів: {e}", level="ERROR")
+            self._server = None
+            return False
+        self._server.daemon_threads = True
+        self._server.tile_cache = self.cache
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="tile-server", daemon=True
+        )
+        self._thread.start()
+        log_message(f"Сервер тайлів запущено на порту {self._server.server_port}.")
+        return True
+
+    def url_template(self, provider: str) -> str:
+        port = self._server.server_port
+        return f"http://{TILE_SERVER_HOST}:{port}/tiles/{provider}/{{z}}/{{x}}/{{y}}.png"
+
+    def seed_in_background(self, points):
+        threading.Thread(
+            target=self.cache.seed_around,
+            args=(list(points),),
+            kwargs={"stop_event": self._seed_stop},
+            name="tile-seed",
+            daemon=True,
+        ).start()
+
+    def stop(self):
+        self._seed_stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.cache.save_index()
 
 
-# ---------------- DISTANCE HELPERS (дві мітки + шлях) ----------------
-def haversine_distance(lat1, lon1, lat2, lon2):
+# ---------------- HELPERS: MAPS & GEOLOCATION ----------------
+class MapApiScript(MacroElement):
     """
-    Обчислює відстань між двома точками (lat/lon у градусах)
-    за формулою гаверсина. Повертає (метри, кілометри).
+    JS-частина карти:
+    - window.mapApi — команди з Python (центр, основна мітка, мітки A/B, лінія маршруту,
+      погодні мітки дашборда улюблених);
+    - міст QWebChannel (об'єкт mapBridge): події click / dblclick / moveend /
+      zoomend / markerdrag / mousemove надсилаються в Python пакетами з
+      порядковими номерами, а команди з Python приходять сигналом command.
+    Рендериться як дочірній елемент карти, тобто вже після L.map(...).
     """
-    R = 6371000.0  # радіус Землі в метрах
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
 
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var mainMarker = {{ this.main_marker_name or "null" }};
+            var extraLayer = L.layerGroup().addTo(map);
+            var routeLayer = L.layerGroup().addTo(map);
+            var routeLine = L.polyline([], {color: '#1e90ff', weight: 4, opacity: 0.85})
+                .addTo(routeLayer);
+            var routeDots = [];
+            var weatherLayer = L.layerGroup().addTo(map);
+            var bridge = null;
+            var seq = 0;
+            var queue = [];
+            var flushScheduled = false;
+            var mouseMoves = [];
+            var mouseMoveTimer = null;
+            var streamMouseMove = false;
+
+            function markerIcon(color, name) {
+                return L.AwesomeMarkers.icon({
+                    icon: name, markerColor: color, prefix: 'glyphicon', iconColor: 'white'
+                });
+            }
 
-    d_m = R * c
-    d_km = d_m / 1000.0
-    return d_m, d_km
+            function addRouteDot(lat, lon) {
+                routeDots.push(L.circleMarker([lat, lon], {
+                    radius: 5, weight: 2, color: '#1e90ff', fillColor: '#fff', fillOpacity: 1
+                }).addTo(routeLayer));
+            }
 
+            function flush() {
+                flushScheduled = false;
+                if (!bridge || !queue.length) { return; }
+                var batch = queue;
+                queue = [];
+                bridge.post_events(JSON.stringify(batch));
+            }
 
-def format_travel_time(distance_km: float, speed_kmh: float) -> str:
+            // дискретні події: у чергу та відправка одним пакетом у найближчій мікрозадачі
+            function emit(ev) {
+                ev.seq = ++seq;
+                queue.push(ev);
+                if (!flushScheduled) {
+                    flushScheduled = true;
+                    Promise.resolve().then(flush);
+                }
+            }
+
+            function latLngEvent(type, latlng, extra) {
+                var ev = {type: type, lat: latlng.lat, lon: latlng.lng};
+                for (var k in extra || {}) { ev[k] = extra[k]; }
+                emit(ev);
+            }
+
+            function viewEvent(type) {
+                var c = map.getCenter();
+                latLngEvent(type, c, {zoom: map.getZoom()});
+            }
+
+            window.mapApi = {
+                setView: function(lat, lon, zoom) {
+                    map.setView([lat, lon], zoom || map.getZoom());
+                },
+                setMainMarker: function(lat, lon) {
+                    if (mainMarker) {
+                        mainMarker.setLatLng([lat, lon]);
+                    } else {
+                        mainMarker = L.marker([lat, lon], {icon: markerIcon('red', 'info-sign')})
+                            .bindTooltip('Selected location')
+                            .addTo(map);
+                    }
+                },
+                setExtraMarkers: function(markers) {
+                    extraLayer.clearLayers();
+                    markers.forEach(function(em) {
+                        var mk = L.marker([em.lat, em.lon], {
+                            icon: markerIcon(em.color || 'green', 'flag'),
+                            draggable: !!em.id
+                        }).bindTooltip(em.tooltip || 'Point').addTo(extraLayer);
+                        if (em.id) {
+                            mk.on('dragend', function() {
+                                latLngEvent('markerdrag', mk.getLatLng(), {id: em.id});
+                            });
+                        }
+                    });
+                },
+                setMouseMoveStreaming: function(enabled) {
+                    streamMouseMove = !!enabled;
+                },
+                // маршрут: повна заміна (після завантаження) або інкрементні зміни
+                setRoute: function(points) {
+                    routeLine.setLatLngs(points);
+                    routeDots.forEach(function(dot) { routeLayer.removeLayer(dot); });
+                    routeDots = [];
+                    points.forEach(function(p) { addRouteDot(p[0], p[1]); });
+                },
+                addRoutePoint: function(lat, lon) {
+                    routeLine.addLatLng([lat, lon]);
+                    addRouteDot(lat, lon);
+                },
+                removeLastRoutePoint: function() {
+                    var latlngs = routeLine.getLatLngs();
+                    if (latlngs.length) {
+                        latlngs.pop();
+                        routeLine.setLatLngs(latlngs);
+                    }
+                    var dot = routeDots.pop();
+                    if (dot) { routeLayer.removeLayer(dot); }
+                },
+                // дашборд улюблених: кружечки з постійним підписом «Назва 12°C»
+                setWeatherMarkers: function(markers) {
+                    weatherLayer.clearLayers();
+                    markers.forEach(function(wm) {
+                        L.circleMarker([wm.lat, wm.lon], {
+                            radius: 6, weight: 2, color: '#0ea5e9',
+                            fillColor: wm.color || '#38bdf8', fillOpacity: 0.9
+                        }).bindTooltip(wm.label, {permanent: true, direction: 'top'})
+                          .addTo(weatherLayer);
+                    });
+                }
+            };
+
+            map.on('click', function(e) { latLngEvent('click', e.latlng); });
+            map.on('dblclick', function(e) { latLngEvent('dblclick', e.latlng); });
+            map.on('moveend', function() { viewEvent('moveend'); });
+            map.on('zoomend', function() { viewEvent('zoomend'); });
+
+            // mousemove — високочастотна подія: усі позиції буферизуються і йдуть
+            // у Python одним пакетом не частіше ніж раз на {{ this.mousemove_batch_ms }} мс
+            map.on('mousemove', function(e) {
+                if (!streamMouseMove) { return; }
+                mouseMoves.push(e.latlng);
+                if (mouseMoveTimer === null) {
+                    mouseMoveTimer = setTimeout(function() {
+                        mouseMoveTimer = null;
+                        var moves = mouseMoves;
+                        mouseMoves = [];
+                        moves.forEach(function(latlng) { latLngEvent('mousemove', latlng); });
+                    }, {{ this.mousemove_batch_ms }});
+                }
+            });
+
+            window.mapApi.setExtraMarkers({{ this.extra_markers_json }});
+            window.mapApi.setRoute({{ this.route_json }});
+
+            if (typeof QWebChannel !== 'undefined' && typeof qt !== 'undefined') {
+                new QWebChannel(qt.webChannelTransport, function(channel) {
+                    bridge = channel.objects.mapBridge;
+                    bridge.command.connect(function(method, argsJson) {
+                        var fn = window.mapApi[method];
+                        if (fn) { fn.apply(null, JSON.parse(argsJson)); }
+                    });
+                    bridge.page_ready();
+                    flush();
+                });
+            }
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, main_marker_name=None, extra_markers=None, route=None):
+        super().__init__()
+        self._name = "MapApiScript"
+        self.main_marker_name = main_marker_name
+        self.extra_markers_json = json.dumps(extra_markers or [])
+        self.route_json = json.dumps([list(p) for p in route or []])
+        self.mousemove_batch_ms = MAP_MOUSEMOVE_BATCH_MS
+
+
+class MapBridge(QtCore.QObject):
     """
-    Форматує час у вигляді 'X год Y хв' для заданої відстані (км)
-    та швидкості (км/год).
+    Двобічний міст QWebChannel між картою Leaflet і MapWeatherApp.
+
+    JS -> Python: пакети подій (post_events) розбираються в типізовані сигнали.
+    Порядкові номери подій перевіряються, тож втрати одразу видно в лозі.
+    Python -> JS: send(method, *args) викликає window.mapApi[method](...).
     """
-    if speed_kmh <= 0:
-        return "—"
 
-    hours = distance_km / speed_kmh
-    total_minutes = int(round(hours * 60))
-    h = total_minutes // 60
-    m = total_minutes % 60
+    ready = pyqtSignal()
+    clicked = pyqtSignal(float, float)
+    double_clicked = pyqtSignal(float, float)
+    view_changed = pyqtSignal(float, float, int)  # moveend / zoomend: центр і масштаб
+    marker_dragged = pyqtSignal(str, float, float)
+    mouse_moved = pyqtSignal(float, float)
 
-    if h == 0:
-        return f"{m} хв"
-    return f"{h} год {m} хв"
+    # метод mapApi, аргументи у JSON (слухає JS-сторона)
+    command = pyqtSignal(str, str)
 
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._last_seq = 0
 
-# ---------------- HELPERS: MAPS & GEOLOCATION ----------------
-def build_folium_map(lat, lon, zoom=DEFAULT_ZOOM, marker=True, extra_markers=None):
+    def send(self, method: str, *args):
+        self.command.emit(method, json.dumps(args))
+
+    @QtCore.pyqtSlot()
+    def page_ready(self):
+        self._last_seq = 0
+        self.ready.emit()
+
+    @QtCore.pyqtSlot(str)
+    def post_events(self, batch_json: str):
+        try:
+            events = json.loads(batch_json)
+        except ValueError as e:
+            log_message(f"Некоректний пакет подій карти: {e}", level="ERROR")
+            return
+
+        for ev in events:
+            seq = ev.get("seq", 0)
+            if seq != self._last_seq + 1:
+                log_message(
+                    f"Пропуск подій карти: очікувався #{self._last_seq + 1}, отримано #{seq}.",
+                    level="WARNING",
+                )
+            self._last_seq = seq
+            try:
+                self._dispatch(ev)
+            except Exception as e:
+                log_message(f"Не вдалося обробити подію карти {ev}: {e}", level="ERROR")
+
+    def _dispatch(self, ev: dict):
+        kind = ev.get("type")
+        lat, lon = float(ev["lat"]), float(ev["lon"])
+        if kind == "click":
+            self.clicked.emit(lat, lon)
+        elif kind == "dblclick":
+            self.double_clicked.emit(lat, lon)
+        elif kind in ("moveend", "zoomend"):
+            self.view_changed.emit(lat, lon, int(ev.get("zoom", DEFAULT_ZOOM)))
+        elif kind == "markerdrag":
+            self.marker_dragged.emit(str(ev.get("id")), lat, lon)
+        elif kind == "mousemove":
+            self.mouse_moved.emit(lat, lon)
+
+
+def build_folium_map(lat, lon, zoom=DEFAULT_ZOOM, marker=True, extra_markers=None,
+                     tile_server=None, route=None):
     """
     Створює карту Folium з:
-    - базовими тайлами
+    - базовими тайлами (через локальний кеш, якщо передано tile_server)
     - основною міткою (current location)
-    - додатковими мітками (extra_markers)
-    - JS-обробником подвійного кліку: document.title = 'MAP_DBLCLICK:lat,lon'
+    - додатковими мітками (extra_markers) і лінією маршруту (route: [(lat, lon), ...])
+    - JS-API window.mapApi та містом QWebChannel для подій карти (див. MapApiScript)
     """
-    log_message(f"INFO: Створення карти для Lat: {lat}, Lon: {lon}")
-    m = folium.Map(location=[lat, lon], zoom_start=zoom, control_scale=True)
+    log_message(f"Створення карти для Lat: {lat}, Lon: {lon}")
+    if tile_server is not None and tile_server.running:
+        m = folium.Map(location=[lat, lon], zoom_start=zoom, control_scale=True, tiles=None)
+        for provider, (name, _url, attr) in TILE_PROVIDERS.items():
+            folium.TileLayer(tile_server.url_template(provider), name=name, attr=attr).add_to(m)
+    else:
+        m = folium.Map(location=[lat, lon], zoom_start=zoom, control_scale=True)
+        folium.TileLayer("OpenStreetMap", name="Standard").add_to(m)
+        folium.TileLayer("CartoDB positron", name="Light").add_to(m)
+        folium.TileLayer("CartoDB dark_matter", name="Dark").add_to(m)
 
-    folium.TileLayer("OpenStreetMap", name="Standard").add_to(m)
-    folium.TileLayer("CartoDB positron", name="Light").add_to(m)
-    folium.TileLayer("CartoDB dark_matter", name="Dark").add_to(m)
+    m.get_root().header.add_child(JavascriptLink("qrc:///qtwebchannel/qwebchannel.js"))
 
     folium.LayerControl().add_to(m)
 
+    main_marker = None
     if marker:
-        folium.Marker(
+        main_marker = folium.Marker(
             [lat, lon],
             tooltip="Selected location",
             icon=folium.Icon(color="red", icon="info-sign"),
         ).add_to(m)
 
-    # додаткові мітки (A, B)
-    if extra_markers:
-        for em in extra_markers:
-            try:
-                folium.Marker(
-                    [em["lat"], em["lon"]],
-                    tooltip=em.get("tooltip", "Point"),
-                    icon=folium.Icon(color=em.get("color", "green"), icon="flag"),
-                ).add_to(m)
-            except Exception as e:
-                log_message(f"ERROR: Не вдалося додати додаткову мітку: {e}")
-
     m.add_child(folium.LatLngPopup())
 
-    # JS-обробник подвійного кліку
-    map_id = m.get_name()
-    click_js = f"""
-    <script>
-    (function() {{
-        function onMapDblClick(e) {{
-            var lat = e.latlng.lat.toFixed(6);
-            var lng = e.latlng.lng.toFixed(6);
-            document.title = 'MAP_DBLCLICK:' + lat + ',' + lng;
-        }}
-        if (typeof {map_id} !== 'undefined') {{
-            {map_id}.on('dblclick', onMapDblClick);
-        }}
-    }})();
-    </script>
-    """
-    m.get_root().html.add_child(Element(click_js))
+    # додаткові мітки (A, B) малює JS-API, щоб їх можна було замінювати без перезавантаження
+    m.add_child(
+        MapApiScript(
+            main_marker_name=main_marker.get_name() if main_marker else None,
+            extra_markers=extra_markers,
+            route=route,
+        )
+    )
 
     return m
 
@@ -231,57 +2243,398 @@ def build_folium_map(lat, lon, zoom=DEFAULT_ZOOM, marker=True, extra_markers=Non
 def save_map_html(m, filename):
     try:
         m.save(filename)
-        log_message(f"INFO: Карта збережена у {filename}")
+        log_message(f"Карта збережена у {filename}")
     except Exception as e:
-        log_message(f"ERROR: Не вдалося зберегти карту у {filename}: {e}")
+        log_message(f"Не вдалося зберегти карту у {filename}: {e}", level="ERROR")
+
+
+def normalize_query(text: str) -> str:
+    """Нормалізація запиту: регістр, зайві пробіли, діакритика (Kýiv -> kyiv)."""
+    text = unicodedata.normalize("NFKD", (text or "").casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+class GeocodingService:
+    """
+    Геокодування через один екземпляр Nominatim (створюється один раз).
+
+    Результати кешуються у персистентному LRU-кеші (query -> lat, lon, address),
+    тож повторні пошуки не торкаються мережі. Запити до Nominatim
+    обмежені NOMINATIM_MIN_DELAY згідно з usage policy.
+    """
+
+    def __init__(self, cache_path=GEOCODE_CACHE_FILE):
+        self._geolocator = Nominatim(
+            user_agent=APP_USER_AGENT, adapter_factory=_SharedSessionGeopyAdapter
+        )
+        self._geocode = RateLimiter(
+            self._geolocator.geocode,
+            min_delay_seconds=NOMINATIM_MIN_DELAY,
+            max_retries=0,
+            swallow_exceptions=False,
+        )
+        self.cache = TTLCache(max_entries=GEOCODE_CACHE_MAX_ENTRIES, persist_path=cache_path)
+
+    def geocode(self, address: str):
+        """Повертає (lat, lon, address) або None."""
+        key = normalize_query(address)
+        if not key:
+            return None
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            mark_cache("hit")
+            log_message(f"Геокодування '{address}' взято з кешу.")
+            return tuple(cached)
+        mark_cache("miss")
+
+        try:
+            loc = self._geocode(address, exactly_one=True, timeout=GEOLOCATOR_TIMEOUT)
+        except Exception as e:
+            log_message(f"Помилка геокодування '{address}': {e}", level="ERROR")
+            return None
+        if not loc:
+            return None
+
+        log_message(f"Геокодування успішне: {loc.address}")
+        result = (loc.latitude, loc.longitude, loc.address)
+        self.cache.set(key, list(result))
+        self.cache.save()
+        return result
+
 
+GEOCODER = GeocodingService()
 
+
+@instrumented("nominatim.geocode")
 def geocode_address(address: str):
-    geolocator = Nominatim(user_agent=APP_USER_AGENT)
+    return GEOCODER.geocode(address)
+
+
+@instrumented("ipapi.location")
+def fetch_ip_location():
+    """Визначення приблизних координат за IP (ip-api.com). Повертає (lat, lon)."""
     try:
-        loc = geolocator.geocode(address, exactly_one=True, timeout=GEOLOCATOR_TIMEOUT)
-        if loc:
-            log_message(f"INFO: Геокодування успішне: {loc.address}")
-            return (loc.latitude, loc.longitude, loc.address)
-    except Exception as e:
-        log_message(f"ERROR: Помилка геокодування '{address}': {e}")
-        return None
-    return None
+        r = HTTP.get(IP_API_URL, timeout=IP_API_TIMEOUT).json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log_message(f"Помилка запиту геолокації за IP: {e}", level="ERROR")
+        raise ConnectionError("Не вдалося отримати координати.") from e
+    if r.get("status") != "success":
+        raise ConnectionError("Не вдалося отримати координати.")
+    return r.get("lat"), r.get("lon")
 
 
 # ---------------- HELPERS: WEATHER ----------------
-def fetch_weather(lat: float, lon: float, api_key: str, lang: str = "en"):
+# Коди погодних умов OpenWeatherMap -> (опис англійською, опис українською).
+# Опис рендериться локально, тож дані погоди не залежать від мови інтерфейсу.
+OWM_CONDITIONS = {
+    200: ("thunderstorm with light rain", "гроза з невеликим дощем"),
+    201: ("thunderstorm with rain", "гроза з дощем"),
+    202: ("thunderstorm with heavy rain", "гроза з сильним дощем"),
+    210: ("light thunderstorm", "слабка гроза"),
+    211: ("thunderstorm", "гроза"),
+    212: ("heavy thunderstorm", "сильна гроза"),
+    221: ("ragged thunderstorm", "місцями гроза"),
+    230: ("thunderstorm with light drizzle", "гроза з легкою мрякою"),
+    231: ("thunderstorm with drizzle", "гроза з мрякою"),
+    232: ("thunderstorm with heavy drizzle", "гроза з сильною мрякою"),
+    300: ("light intensity drizzle", "легка мряка"),
+    301: ("drizzle", "мряка"),
+    302: ("heavy intensity drizzle", "сильна мряка"),
+    310: ("light intensity drizzle rain", "легкий дощ з мрякою"),
+    311: ("drizzle rain", "дощ з мрякою"),
+    312: ("heavy intensity drizzle rain", "сильний дощ з мрякою"),
+    313: ("shower rain and drizzle", "злива з мрякою"),
+    314: ("heavy shower rain and drizzle", "сильна злива з мрякою"),
+    321: ("shower drizzle", "мряка зі зливою"),
+    500: ("light rain", "легкий дощ"),
+    501: ("moderate rain", "помірний дощ"),
+    502: ("heavy intensity rain", "сильний дощ"),
+    503: ("very heavy rain", "дуже сильний дощ"),
+    504: ("extreme rain", "екстремальний дощ"),
+    511: ("freezing rain", "крижаний дощ"),
+    520: ("light intensity shower rain", "невелика злива"),
+    521: ("shower rain", "злива"),
+    522: ("heavy intensity shower rain", "сильна злива"),
+    531: ("ragged shower rain", "місцями злива"),
+    600: ("light snow", "легкий сніг"),
+    601: ("snow", "сніг"),
+    602: ("heavy snow", "сильний снігопад"),
+    611: ("sleet", "мокрий сніг"),
+    612: ("light shower sleet", "легкий мокрий сніг"),
+    613: ("shower sleet", "мокрий сніг зі зливою"),
+    615: ("light rain and snow", "легкий дощ зі снігом"),
+    616: ("rain and snow", "дощ зі снігом"),
+    620: ("light shower snow", "невеликий снігопад"),
+    621: ("shower snow", "снігопад"),
+    622: ("heavy shower snow", "сильний снігопад"),
+    701: ("mist", "серпанок"),
+    711: ("smoke", "дим"),
+    721: ("haze", "імла"),
+    731: ("sand/dust whirls", "піщані та пилові вихори"),
+    741: ("fog", "туман"),
+    751: ("sand", "пісок"),
+    761: ("dust", "пил"),
+    762: ("volcanic ash", "вулканічний попіл"),
+    771: ("squalls", "шквали"),
+    781: ("tornado", "торнадо"),
+    800: ("clear sky", "чисте небо"),
+    801: ("few clouds", "мало хмар"),
+    802: ("scattered clouds", "розсіяні хмари"),
+    803: ("broken clouds", "хмарно з проясненнями"),
+    804: ("overcast clouds", "суцільна хмарність"),
+}
+
+
+def describe_condition(weather: dict, lang: str = "en") -> str:
+    """Локалізований опис погоди за кодом умов OpenWeatherMap (weather[0])."""
+    names = OWM_CONDITIONS.get((weather or {}).get("id"))
+    if names:
+        return names[1] if lang == "uk" else names[0]
+    return (weather or {}).get("description", "—")
+
+
+def lang_query(lang) -> str:
+    return f"&lang={lang}" if lang else ""
+
+
+class MinuteQuota:
+    """
+    Потокобезпечне обмеження «не більше N викликів за 60 с» (ковзне вікно).
+    acquire() блокує потік, доки не звільниться слот; з token — перериває
+    очікування при скасуванні (CancelledError). Фонові виклики
+    (background=True) не займають останні reserve слотів, тож інтерактивні
+    запити не чекають, поки дашборд чи опитування вичерпають квоту.
+    """
+
+    def __init__(self, per_minute: int, reserve: int = 0):
+        self.per_minute = per_minute
+        self.reserve = reserve
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, token=None, background: bool = False):
+        limit = self.per_minute - self.reserve if background else self.per_minute
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= 60.0:
+                    self._calls.popleft()
+                if len(self._calls) < limit:
+                    self._calls.append(now)
+                    return
+                wait_s = 60.0 - (now - self._calls[len(self._calls) - limit])
+            if token is not None and token.cancelled:
+                raise CancelledError()
+            time.sleep(min(wait_s, 0.5))
+
+
+OWM_QUOTA = MinuteQuota(OWM_CALLS_PER_MINUTE, reserve=OWM_INTERACTIVE_RESERVE)
+
+
+@instrumented("owm.weather")
+def fetch_weather(lat: float, lon: float, api_key: str, lang: str = None, use_cache: bool = True,
+                  token=None, background: bool = False, acquire_quota: bool = True):
+    """
+    Поточна погода. Без lang відповідь мовно-незалежна (англійська за замовчуванням),
+    а локалізований опис будується через describe_condition.
+    token / background передаються в OWM_QUOTA.acquire(); acquire_quota=False —
+    слот квоти вже взяв викликач.
+    """
+    cache_key = weather_cache_key("weather", lat, lon, lang)
+    if use_cache:
+        cached = WEATHER_CACHE.get(cache_key)
+        if cached is not None:
+            mark_cache("hit")
+            log_message(f"Погода для ({lat}, {lon}) взята з кешу.")
+            return cached
+        mark_cache("miss")
+
     url = (
         "https://api.openweathermap.org/data/2.5/weather"
-        f"?lat={lat}&lon={lon}&units=metric&lang={lang}&appid={api_key}"
+        f"?lat={lat}&lon={lon}&units=metric{lang_query(lang)}&appid={api_key}"
     )
-    log_message(f"INFO: Запит погоди для ({lat}, {lon})")
+    log_message(f"Запит погоди для ({lat}, {lon})")
     try:
-        r = requests.get(url, timeout=WEATHER_API_TIMEOUT)
+        if acquire_quota:
+            OWM_QUOTA.acquire(token, background)
+        r = HTTP.get(url, timeout=WEATHER_API_TIMEOUT)
         r.raise_for_status()
-        return r.json()
+        data = r.json()
     except requests.exceptions.RequestException as e:
-        log_message(f"ERROR: Помилка запиту погоди: {e}")
+        log_message(f"Помилка запиту погоди: {e}", level="ERROR")
         if "401 Client Error" in str(e):
             raise ConnectionError("Помилка API: Невірний ключ OpenWeatherMap.") from e
         raise ConnectionError("Помилка підключення до служби погоди.") from e
 
+    WEATHER_CACHE.set(cache_key, data, ttl=WEATHER_CACHE_TTL)
+    return data
 
-def fetch_forecast(lat: float, lon: float, api_key: str, lang: str = "en"):
+
+@instrumented("owm.forecast")
+def fetch_forecast(lat: float, lon: float, api_key: str, lang: str = None, use_cache: bool = True,
+                   token=None, background: bool = False):
     """Отримання 5-денного прогнозу (крок 3 год)."""
+    cache_key = weather_cache_key("forecast", lat, lon, lang)
+    if use_cache:
+        cached = WEATHER_CACHE.get(cache_key)
+        if cached is not None:
+            mark_cache("hit")
+            log_message(f"Прогноз для ({lat}, {lon}) взято з кешу.")
+            return cached
+        mark_cache("miss")
+
     url = (
         "https://api.openweathermap.org/data/2.5/forecast"
-        f"?lat={lat}&lon={lon}&units=metric&lang={lang}&appid={api_key}"
+        f"?lat={lat}&lon={lon}&units=metric{lang_query(lang)}&appid={api_key}"
     )
-    log_message(f"INFO: Запит прогнозу для ({lat}, {lon})")
+    log_message(f"Запит прогнозу для ({lat}, {lon})")
     try:
-        r = requests.get(url, timeout=WEATHER_API_TIMEOUT)
+        OWM_QUOTA.acquire(token, background)
+        r = HTTP.get(url, timeout=WEATHER_API_TIMEOUT)
         r.raise_for_status()
-        return r.json()
+        data = r.json()
     except requests.exceptions.RequestException as e:
-        log_message(f"ERROR: Помилка запиту прогнозу: {e}")
+        log_message(f"Помилка запиту прогнозу: {e}", level="ERROR")
         return None
 
+    WEATHER_CACHE.set(cache_key, data, ttl=FORECAST_CACHE_TTL)
+    return data
+
+
+def fetch_weather_bundle(lat: float, lon: float, lang: str = None,
+                         api_key: str = OPENWEATHERMAP_API_KEY, on_part=None, token=None):
+    """
+    Паралельно запитує поточну погоду та прогноз для (lat, lon, lang).
+    on_part(kind, data) викликається для кожної частини, щойно вона надійде
+    (kind: "weather" або "forecast"). Повертає {"weather": ..., "forecast": ...}.
+    Помилка погоди (ConnectionError) прокидається після завершення обох запитів.
+    """
+    futures = {
+        IO_EXECUTOR.submit(fetch_weather, lat, lon, api_key, lang, token=token): "weather",
+        IO_EXECUTOR.submit(fetch_forecast, lat, lon, api_key, lang, token=token): "forecast",
+    }
+    bundle = {"weather": None, "forecast": None}
+    error = None
+    for future in as_completed(futures):
+        kind = futures[future]
+        try:
+            bundle[kind] = future.result()
+        except Exception as e:
+            error = e
+            continue
+        if on_part:
+            on_part(kind, bundle[kind])
+
+    if error is not None:
+        raise error
+    return bundle
+
+
+@instrumented("owm.group")
+def fetch_weather_group(city_ids, api_key: str = OPENWEATHERMAP_API_KEY, token=None) -> dict:
+    """Поточна погода для до OWM_GROUP_MAX_IDS міст одним запитом: {id міста: дані}."""
+    OWM_QUOTA.acquire(token, background=True)
+    r = HTTP.get(
+        "https://api.openweathermap.org/data/2.5/group",
+        params={"id": ",".join(str(i) for i in city_ids), "units": "metric", "appid": api_key},
+        timeout=WEATHER_API_TIMEOUT,
+    )
+    r.raise_for_status()
+    return {item["id"]: item for item in r.json().get("list", [])}
+
+
+def fetch_weather_many(places, api_key: str = OPENWEATHERMAP_API_KEY, progress=None,
+                       token=None) -> dict:
+    """
+    Поточна погода для багатьох місць ({"lat", "lon", необов'язково "owm_id"}).
+    Місця з відомим id міста йдуть пакетами через /group, решта — паралельно
+    (не більше DASHBOARD_MAX_CONCURRENCY запитів одночасно, кеш WEATHER_CACHE
+    враховується). Усі запити — фонові для OWM_QUOTA (резерв інтерактивних не
+    займають); слот квоти береться тут, до передачі запиту в IO_EXECUTOR, тож
+    потоки спільного пулу не простоюють в очікуванні квоти. progress((індекс, дані | виняток)) викликається для кожного місця
+    одразу після отримання.
+    Повертає {"ok": кількість, "failed": кількість}.
+    """
+    stats = {"ok": 0, "failed": 0}
+
+    def report(index, result):
+        stats["failed" if isinstance(result, Exception) else "ok"] += 1
+        if progress:
+            progress((index, result))
+
+    by_id = {}
+    single = []
+    for index, place in enumerate(places):
+        if place.get("owm_id"):
+            by_id.setdefault(place["owm_id"], []).append(index)
+        else:
+            single.append(index)
+
+    ids = list(by_id)
+    for start in range(0, len(ids), OWM_GROUP_MAX_IDS):
+        if token is not None and token.cancelled:
+            return stats
+        chunk = ids[start:start + OWM_GROUP_MAX_IDS]
+        try:
+            found = fetch_weather_group(chunk, api_key, token=token)
+        except CancelledError:
+            return stats
+        except Exception as e:
+            # пакет не вдався — ці місця підуть звичайними запитами за координатами
+            log_message(f"Запит /group не вдався ({e}), повторюю поодинці.", level="WARNING")
+            single += [i for city_id in chunk for i in by_id[city_id]]
+            continue
+        for city_id in chunk:
+            for index in by_id[city_id]:
+                data = found.get(city_id)
+                if data is None:
+                    single.append(index)
+                    continue
+                place = places[index]
+                WEATHER_CACHE.set(
+                    weather_cache_key("weather", place["lat"], place["lon"]), data,
+                    ttl=WEATHER_CACHE_TTL,
+                )
+                report(index, data)
+
+    pending = {}
+    queue_ = list(single)
+    while queue_ or pending:
+        while queue_ and len(pending) < DASHBOARD_MAX_CONCURRENCY:
+            if token is not None and token.cancelled:
+                queue_.clear()
+                break
+            index = queue_.pop(0)
+            place = places[index]
+            cached = WEATHER_CACHE.get(weather_cache_key("weather", place["lat"], place["lon"]))
+            if cached is not None:
+                report(index, cached)
+                continue
+            try:
+                OWM_QUOTA.acquire(token, background=True)
+            except CancelledError:
+                queue_.clear()
+                break
+            future = IO_EXECUTOR.submit(
+                fetch_weather, place["lat"], place["lon"], api_key, use_cache=False,
+                token=token, acquire_quota=False,
+            )
+            pending[future] = index
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                report(index, future.result())
+            except CancelledError:
+                pass
+            except Exception as e:
+                report(index, e)
+    return stats
+
 
 def weather_summary_text(data: dict, lang: str = "en"):
     w = data.get("weather", [{}])[0]
@@ -293,7 +2646,7 @@ def weather_summary_text(data: dict, lang: str = "en"):
     country = sys_data.get("country", "")
     full_name = f"{name}, {country}" if country else name
 
-    desc = w.get("description", "—").capitalize()
+    desc = describe_condition(w, lang).capitalize()
     temp = main.get("temp")
     feels = main.get("feels_like")
     hum = main.get("humidity")
@@ -339,252 +2692,710 @@ def weather_summary_text(data: dict, lang: str = "en"):
     return "\n".join(lines), desc, temp
 
 
-# ---------------- AI ASSISTANT IMPLEMENTATION ----------------
-def translate_to_ukrainian(text: str) -> str:
-    """Перекладає англійський текст українською через LibreTranslate API."""
-    try:
-        response = requests.post(
-            TRANSLATE_URL,
-            data={
-                "q": text,
-                "source": "en",
-                "target": "uk",
-                "format": "text",
-            },
-            timeout=8,
-        )
+# ---------------- BACKGROUND FETCH ENGINE ----------------
+class CancelToken:
+    """Прапорець скасування фонового запиту (перевіряється у потоці пулу)."""
 
-        if response.status_code == 200:
-            translated = response.json().get("translatedText", text)
-            return translated
-        else:
-            return text
-    except Exception:
-        return text
+    def __init__(self):
+        self._event = threading.Event()
 
+    def cancel(self):
+        self._event.set()
 
-def google_search_tool(query: str):
-    """Реальний пошук через SerpAPI + автоматичний переклад результатів."""
-    if not SERPAPI_KEY:
-        log_message("ERROR: SerpAPI ключ не знайдено.")
-        return [
-            {
-                "snippet": "❌ SerpAPI ключ не знайдено. Додайте його у змінну SERPAPI_KEY.",
-                "source_title": "Система (Помилка API)",
-            }
-        ]
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
 
-    try:
-        params = {
-            "engine": "google",
-            "q": f"facts and history about {query}",
-            "hl": "en",
-            "gl": "us",
-            "api_key": SERPAPI_KEY,
-        }
 
-        search = GoogleSearch(params)
-        results = search.get_dict()
+class _FetchSignals(QtCore.QObject):
+    """Сигнали для QRunnable (сам QRunnable не є QObject)."""
 
-        snippets = []
-        if "organic_results" in results:
-            for item in results["organic_results"][:3]:
-                snippet = item.get("snippet", "No description.")
-                title = item.get("title", "No title")
+    # request_id, статус ("ok" / "error" / "cancelled"), результат або виняток
+    completed = pyqtSignal(int, str, object)
+    # request_id, проміжний результат (часткові дані)
+    progress = pyqtSignal(int, object)
 
-                translated_snippet = translate_to_ukrainian(snippet)
-                translated_title = translate_to_ukrainian(title)
 
-                snippets.append(
-                    {"snippet": translated_snippet, "source_title": translated_title}
-                )
+class _FetchJob(QRunnable):
+    """
+    Одна задача FetchEngine: виконує fn(*args, **kwargs) у потоці пулу.
+    Результат отримують усі «слухачі» — канали, що підписались на задачу
+    (кілька, якщо однакові запити об'єднано через coalesce_key).
+    """
 
-        if not snippets:
-            snippets.append(
-                {
-                    "snippet": f"Інформація про {query.title()} не знайдена в результатах пошуку.",
-                    "source_title": "Google Search",
-                }
+    def __init__(self, request_id, fn, args, kwargs, signals, priority=0,
+                 coalesce_key=None, with_progress=False, with_token=False):
+        super().__init__()
+        self.setAutoDelete(False)  # посилання тримає FetchEngine до завершення
+        self.request_id = request_id
+        self.token = CancelToken()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = signals
+        self.priority = priority
+        self.coalesce_key = coalesce_key
+        self.listeners = {}  # channel -> (on_result, on_error, on_progress)
+        self.progress_log = []  # уже доставлені проміжні результати (для пізніх слухачів)
+        if with_progress:
+            self.kwargs["progress"] = self.report_progress
+        if with_token:
+            self.kwargs["token"] = self.token
+
+    def report_progress(self, payload):
+        """Передати проміжний результат у GUI-потік (якщо задачу не скасовано)."""
+        if not self.token.cancelled:
+            self.signals.progress.emit(self.request_id, payload)
+
+    def run(self):
+        if self.token.cancelled:
+            self.signals.completed.emit(self.request_id, "cancelled", None)
+            return
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.completed.emit(self.request_id, "error", e)
+            return
+        status = "cancelled" if self.token.cancelled else "ok"
+        self.signals.completed.emit(self.request_id, status, result)
+
+
+class FetchEngine(QtCore.QObject):
+    """
+    Спільний фоновий рушій мережевих запитів на базі QThreadPool.
+
+    Кожен запит належить до «каналу» (weather, geocode, ip_location...).
+    Новий запит у каналі скасовує попередній, тож у GUI потрапляє лише
+    найсвіжіший результат. Колбеки on_result / on_error / on_progress
+    викликаються у GUI-потоці через сигнал, тому в них можна безпечно
+    чіпати віджети. Якщо задано on_progress, fn отримує аргумент progress;
+    з with_token=True — ще й token (CancelToken) для перевірки скасування.
+
+    Задачі з однаковим coalesce_key, поки перша не завершилась, не
+    запускаються повторно: новий канал підписується на вже наявну задачу
+    (отримавши всі проміжні результати, що вже надійшли), а її пріоритет
+    піднімається до найвищого серед слухачів. Задача скасовується, коли
+    від неї відписались усі канали.
+    """
+
+    def __init__(self, max_threads: int = FETCH_MAX_THREADS, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _FetchSignals()
+        self._signals.completed.connect(self._on_job_completed)
+        self._signals.progress.connect(self._on_job_progress)
+        self._next_id = 0
+        self._jobs = {}      # request_id -> _FetchJob
+        self._channels = {}  # channel -> request_id останнього запиту
+        self._coalesced = {}  # coalesce_key -> request_id задачі, що виконується
+
+    def submit(self, channel: str, fn, *args, on_result=None, on_error=None,
+               on_progress=None, priority: int = 0, coalesce_key=None,
+               with_progress: bool = False, with_token: bool = False, **kwargs) -> int:
+        """Поставити fn у чергу пулу. Попередній запит цього каналу скасовується."""
+        self.cancel(channel)
+        listener = (on_result, on_error, on_progress)
+
+        job = self._jobs.get(self._coalesced.get(coalesce_key)) if coalesce_key else None
+        if job is not None and not job.token.cancelled:
+            job.listeners[channel] = listener
+            self._channels[channel] = job.request_id
+            if on_progress is not None:
+                for payload in job.progress_log:
+                    on_progress(payload)
+            # задача ще в черзі — переставляємо її з вищим пріоритетом
+            if priority > job.priority and self._pool.tryTake(job):
+                job.priority = priority
+                self._pool.start(job, priority)
+            return job.request_id
+
+        self._next_id += 1
+        job = _FetchJob(
+            self._next_id, fn, args, kwargs, self._signals, priority=priority,
+            coalesce_key=coalesce_key, with_progress=with_progress or on_progress is not None,
+            with_token=with_token,
+        )
+        job.listeners[channel] = listener
+        self._jobs[job.request_id] = job
+        self._channels[channel] = job.request_id
+        if coalesce_key is not None:
+            self._coalesced[coalesce_key] = job.request_id
+        self._pool.start(job, priority)
+        return job.request_id
+
+    def is_pending(self, channel: str) -> bool:
+        return channel in self._channels
+
+    def cancel(self, channel: str):
+        """Скасувати поточний запит каналу (його результат буде відкинуто)."""
+        request_id = self._channels.pop(channel, None)
+        job = self._jobs.get(request_id)
+        if job is None:
+            return
+        job.listeners.pop(channel, None)
+        if not job.listeners:
+            self._cancel_job(request_id)
+
+    def cancel_all(self):
+        for channel in list(self._channels):
+            self.cancel(channel)
+
+    def stop(self):
+        """
+        Скасувати все і від'єднати сигнали: пізні результати вже нікуди не
+        доставляються. Активні потоки не очікуються (див. shutdown_engines).
+        """
+        self.cancel_all()
+        self._pool.clear()
+        for signal in (self._signals.completed, self._signals.progress):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass  # уже від'єднано (повторний виклик)
+
+    def wait(self, timeout_ms: int) -> bool:
+        return self._pool.waitForDone(max(int(timeout_ms), 0))
+
+    def shutdown(self, timeout_ms: int = SHUTDOWN_WAIT_MS) -> bool:
+        return shutdown_engines([self], timeout_ms)
+
+    def _cancel_job(self, request_id: int):
+        job = self._jobs.get(request_id)
+        if job is None:
+            return
+        job.token.cancel()
+        if self._coalesced.get(job.coalesce_key) == request_id:
+            del self._coalesced[job.coalesce_key]
+        # задача ще в черзі — просто забираємо її з пулу
+        if self._pool.tryTake(job):
+            del self._jobs[request_id]
+
+    def _on_job_progress(self, request_id: int, payload):
+        job = self._jobs.get(request_id)
+        if job is None or job.token.cancelled:
+            return
+        job.progress_log.append(payload)
+        for _, _, on_progress in list(job.listeners.values()):
+            if on_progress is not None:
+                on_progress(payload)
+
+    def _on_job_completed(self, request_id: int, status: str, payload):
+        job = self._jobs.pop(request_id, None)
+        if job is None:
+            return
+        if self._coalesced.get(job.coalesce_key) == request_id:
+            del self._coalesced[job.coalesce_key]
+        for channel in job.listeners:
+            if self._channels.get(channel) == request_id:
+                del self._channels[channel]
+        if status == "cancelled" or job.token.cancelled:
+            return
+
+        if status != "ok":
+            log_message(
+                f"Фоновий запит '{', '.join(job.listeners)}' завершився помилкою: {payload}", level="ERROR"
             )
+        for on_result, on_error, _ in list(job.listeners.values()):
+            if status == "ok":
+                if on_result:
+                    on_result(payload)
+            elif on_error:
+                on_error(payload)
 
-        return snippets
 
-    except Exception as e:
-        log_message(f"ERROR: SerpAPI пошук провалився: {e}")
-        return [
-            {
-                "snippet": f"Помилка під час пошуку через SerpAPI: {e}. Перевірте ключ та ліміти.",
-                "source_title": "SerpAPI",
-            }
-        ]
+def shutdown_engines(engines, timeout_ms: int = SHUTDOWN_WAIT_MS) -> bool:
+    """
+    Зупинити кілька пулів одночасно й дочекатися їх у спільних межах timeout_ms
+    (а не послідовно, кожен зі своїм лімітом). Задачі, що не встигли, дороблять
+    у фоні — їхні результати вже від'єднано.
+    """
+    for engine in engines:
+        engine.stop()
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    done = True
+    for engine in engines:
+        done = engine.wait((deadline - time.monotonic()) * 1000) and done
+    if not done:
+        log_message(f"Фонові задачі не завершились за {timeout_ms} мс.", level="WARNING")
+    return done
+
+
+class RefreshScheduler(QtCore.QObject):
+    """
+    Відкладене оновлення після зміни локації. Запити, що надходять частіше
+    ніж раз на debounce_ms, зливаються в один — з останньою ціллю, тож мережу
+    й рендер оплачує лише фінальна локація. Кожне застосування отримує номер
+    покоління: відповіді, що прийшли вже після вибору новішої локації,
+    відкидаються через is_current().
+    """
 
+    def __init__(self, apply_fn, debounce_ms: int = REFRESH_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self._apply = apply_fn  # apply_fn(lat, lon, generation)
+        self._target = None
+        self.generation = 0
+        self.coalesced = 0  # скільки проміжних локацій так і не завантажувались
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._fire)
+
+    @property
+    def pending(self) -> bool:
+        return self._target is not None
+
+    def request(self, lat: float, lon: float, immediate: bool = False):
+        """Запланувати оновлення для (lat, lon); попередня незастосована ціль відкидається."""
+        if self._target is not None:
+            self.coalesced += 1
+        self._target = (lat, lon)
+        self.generation += 1
+        if immediate:
+            self.flush()
+        else:
+            self._timer.start()
 
-def google_search_for_info(query: str):
-    """Обгортка для пошуку та форматування результатів у HTML."""
-    results = google_search_tool(query)
+    def flush(self):
+        """Застосувати відкладену ціль негайно (якщо є)."""
+        self._timer.stop()
+        self._fire()
 
-    if not results:
-        return None
+    def cancel(self):
+        self._timer.stop()
+        self._target = None
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
+
+    def _fire(self):
+        target, self._target = self._target, None
+        if target is not None:
+            self._apply(target[0], target[1], self.generation)
+
+
+# поля відповіді OWM, що не описують саму погоду (час вимірювання, службові)
+_WEATHER_VOLATILE_KEYS = ("dt", "cod", "id", "timezone", "base", "sys")
 
-    summary = ""
-    for item in results[:3]:
-        summary += (
-            f"<b>Джерело:</b> <span style='color:#76a9ff;'>{item['source_title']}</span><br>"
-        )
-        summary += f"{item['snippet']}<br><br>"
 
-    return summary.strip()
+def weather_payload_hash(data: dict) -> str:
+    """Хеш відповіді поточної погоди без службових полів: однаковий — нічого не змінилось."""
+    stable = {k: v for k, v in (data or {}).items() if k not in _WEATHER_VOLATILE_KEYS}
+    return hashlib.sha1(json.dumps(stable, sort_keys=True).encode("utf-8")).hexdigest()
 
 
-# ------------ TRAVEL SUGGESTIONS (міста/місця) ------------
-def google_travel_suggestions(query: str, mode: str = "city"):
+class AutoRefreshService(QtCore.QObject):
     """
-    Повертає список цікавих місць (для міста) або міст (для країни)
-    через SerpAPI + автоматичний переклад на українську.
-    mode: "city" або "country"
+    Фонове опитування поточної погоди з адаптивним інтервалом:
+    - помітна зміна (інший код погоди або температура на AUTO_REFRESH_TEMP_DELTA+)
+      повертає інтервал до AUTO_REFRESH_MIN_S;
+    - ідентична відповідь (за weather_payload_hash) не перемальовується, а
+      інтервал зростає в AUTO_REFRESH_BACKOFF разів до AUTO_REFRESH_MAX_S;
+    - поки вікно приховане, інтервал множиться на AUTO_REFRESH_HIDDEN_FACTOR.
     """
-    if not SERPAPI_KEY:
-        log_message("ERROR: SerpAPI ключ не знайдено (travel).")
-        return [
-            {
-                "title": "Помилка API",
-                "snippet": "❌ SerpAPI ключ не знайдено. Додайте його у змінну SERPAPI_KEY."
-            }
-        ]
 
-    try:
-        if mode == "country":
-            q = f"top 7 cities to visit in {query} with short descriptions"
-        else:
-            q = f"top 7 tourist attractions in {query} with short descriptions"
-
-        params = {
-            "engine": "google",
-            "q": q,
-            "hl": "en",
-            "gl": "us",
-            "api_key": SERPAPI_KEY,
-        }
+    CHANNEL = "weather_poll"
+
+    def __init__(self, fetch_engine: FetchEngine, location_fn, on_changed, is_visible_fn,
+                 parent=None):
+        super().__init__(parent)
+        self._engine = fetch_engine
+        self._location = location_fn      # () -> (lat, lon)
+        self._on_changed = on_changed     # (data) -> None, лише коли дані змінились
+        self._is_visible = is_visible_fn  # () -> bool
+        self.interval = AUTO_REFRESH_MIN_S
+        self.skipped = 0  # опитувань без змін (рендер пропущено)
+        self._last_hash = None
+        self._last_sample = None  # (температура, код погоди)
+        self._last_poll = time.monotonic()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.poll)
+
+    def current_interval(self) -> float:
+        factor = 1 if self._is_visible() else AUTO_REFRESH_HIDDEN_FACTOR
+        return self.interval * factor
+
+    def start(self):
+        if AUTO_REFRESH_ENABLED:
+            self.reschedule()
+
+    def stop(self):
+        self._timer.stop()
+        self._engine.cancel(self.CHANNEL)
+
+    def reschedule(self):
+        """Перезапустити таймер з урахуванням часу від останнього опитування і видимості вікна."""
+        if not AUTO_REFRESH_ENABLED:
+            return
+        delay = max(0.0, self._last_poll + self.current_interval() - time.monotonic())
+        self._timer.start(int(delay * 1000))
+
+    def cancel_poll(self):
+        """Скасувати опитування, що виконується, і заново запланувати наступне."""
+        self._engine.cancel(self.CHANNEL)
+        self.reschedule()
+
+    def reset(self):
+        """Дані щойно завантажено користувачем (нова локація / Refresh) — відлік заново."""
+        self.interval = AUTO_REFRESH_MIN_S
+        self._last_poll = time.monotonic()
+        self._engine.cancel(self.CHANNEL)
+        self.reschedule()
+
+    def note_rendered(self, data: dict):
+        """Запам'ятати відмальовані дані як еталон для наступного порівняння."""
+        self._last_hash = weather_payload_hash(data)
+        self._last_sample = self._sample(data)
+
+    @staticmethod
+    def _sample(data: dict):
+        temp = (data.get("main") or {}).get("temp")
+        code = ((data.get("weather") or [{}])[0]).get("id")
+        return temp, code
+
+    def poll(self):
+        lat, lon = self._location()
+        self._last_poll = time.monotonic()
+        self._engine.submit(
+            self.CHANNEL, fetch_weather, lat, lon, OPENWEATHERMAP_API_KEY, use_cache=False,
+            background=True,
+            on_result=functools.partial(self._on_polled, (lat, lon)),
+            on_error=self._on_poll_failed,
+            priority=PRIORITY_PREFETCH, with_token=True,
+        )
+
+    def _on_polled(self, location, data: dict):
+        if location != tuple(self._location()):
+            self.reschedule()  # поки йшов запит, локацію змінили
+            return
+
+        if weather_payload_hash(data) == self._last_hash:
+            self.skipped += 1
+            self.interval = min(self.interval * AUTO_REFRESH_BACKOFF, AUTO_REFRESH_MAX_S)
+            log_message(
+                f"Погода без змін, наступне опитування через {self.current_interval():.0f} с.",
+                level="DEBUG",
+            )
+        else:
+            temp, code = self._sample(data)
+            old_temp, old_code = self._last_sample or (None, None)
+            significant = (
+                code != old_code
+                or temp is None
+                or old_temp is None
+                or abs(temp - old_temp) >= AUTO_REFRESH_TEMP_DELTA
+            )
+            if significant:
+                self.interval = AUTO_REFRESH_MIN_S
+            self.note_rendered(data)
+            self._on_changed(data)
+            log_message(f"Погода оновилась у фоні, наступне опитування через {self.current_interval():.0f} с.")
+        self.reschedule()
+
+    def _on_poll_failed(self, error: Exception):
+        self.interval = min(self.interval * AUTO_REFRESH_BACKOFF, AUTO_REFRESH_MAX_S)
+        self.reschedule()
+
+
+# ---------------- AI ASSISTANT IMPLEMENTATION ----------------
+SERPAPI_CACHE = TTLCache(
+    max_entries=SERPAPI_CACHE_MAX_ENTRIES,
+    ttl=SERPAPI_CACHE_TTL,
+    stale_ttl=SERPAPI_CACHE_STALE_TTL,
+    persist_path=SERPAPI_CACHE_FILE,
+)
+_serpapi_refreshing = set()
+_serpapi_refresh_lock = threading.Lock()
+
+
+def serpapi_cache_key(query: str, mode: str, hl: str = SERPAPI_HL, gl: str = SERPAPI_GL) -> str:
+    # префікс "raw" відділяє сирі результати від перекладених записів старих версій
+    return f"raw:{mode}:{hl}:{gl}:{normalize_query(query)}"
+
+
+def _serpapi_revalidate(key: str, fetch):
+    """Фонове оновлення застарілого запису (не більше одного на ключ одночасно)."""
+    with _serpapi_refresh_lock:
+        if key in _serpapi_refreshing:
+            return
+        _serpapi_refreshing.add(key)
+
+    def refresh():
+        try:
+            with request_span("serpapi.revalidate"):
+                SERPAPI_CACHE.set(key, fetch())
+            log_message(f"Кеш SerpAPI '{key}' оновлено у фоні.")
+        except Exception as e:
+            log_message(f"Фонове оновлення SerpAPI '{key}' не вдалося: {e}", level="WARNING")
+        finally:
+            with _serpapi_refresh_lock:
+                _serpapi_refreshing.discard(key)
+
+    IO_EXECUTOR.submit(refresh)
+
+
+class TranslationService:
+    """
+    Переклад через LibreTranslate. Спершу перевіряється пам'ять перекладів;
+    решта рядків одного набору результатів (без повторів) іде одним запитом
+    із масивом у полі "q". Якщо пакетний запит не вдався — рядки
+    перекладаються поодинці паралельно через IO_EXECUTOR.
+    Неперекладені рядки повертаються як є.
+    """
 
-        search = GoogleSearch(params)
-        results = search.get_dict()
+    def __init__(self, url: str = TRANSLATE_URL, source: str = "en", target: str = "uk",
+                 memory=None):
+        self.url = url
+        self.source = source
+        self.target = target
+        self.memory = memory
 
-        items = []
-        if "organic_results" in results:
-            for item in results["organic_results"][:5]:
-                title = item.get("title", "No title")
-                snippet = item.get("snippet", "No description.")
+    def _payload(self, q):
+        return {"q": q, "source": self.source, "target": self.target, "format": "text"}
 
-                title_uk = translate_to_ukrainian(title)
-                snippet_uk = translate_to_ukrainian(snippet)
+    @instrumented("libretranslate.translate")
+    def _translate_one(self, text: str):
+        """Переклад одного рядка запитом до сервера; None, якщо не вдалося."""
+        try:
+            response = HTTP.post(self.url, data=self._payload(text), timeout=TRANSLATE_TIMEOUT)
+            if response.status_code == 200:
+                return response.json().get("translatedText")
+        except Exception:
+            pass
+        return None
 
-                items.append(
-                    {
-                        "title": title_uk,
-                        "snippet": snippet_uk
-                    }
+    def translate(self, text: str) -> str:
+        """Переклад одного рядка."""
+        return self.translate_many([text])[0]
+
+    @instrumented("libretranslate.batch")
+    def _translate_batch(self, texts: list) -> list:
+        """Один запит на весь список; ValueError, якщо сервер не повернув масив тієї ж довжини."""
+        response = HTTP.post(self.url, json=self._payload(texts), timeout=TRANSLATE_TIMEOUT)
+        response.raise_for_status()
+        translated = response.json().get("translatedText")
+        if not isinstance(translated, list) or len(translated) != len(texts):
+            raise ValueError("сервер не підтримує пакетний переклад")
+        return translated
+
+    def translate_many(self, texts) -> list:
+        """Перекладає список рядків, зберігаючи порядок; порожні рядки не надсилаються."""
+        texts = list(texts)
+        unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+        if not unique:
+            return texts
+
+        translated = {}
+        if self.memory is not None:
+            with request_span("translation.memory"):
+                translated = self.memory.get_many(unique, self.source, self.target)
+                if len(translated) == len(unique):
+                    mark_cache("hit")
+                else:
+                    mark_cache("partial" if translated else "miss")
+        missing = [t for t in unique if t not in translated]
+
+        fresh = {}
+        for start in range(0, len(missing), TRANSLATE_BATCH_MAX):
+            chunk = missing[start:start + TRANSLATE_BATCH_MAX]
+            try:
+                fresh.update(zip(chunk, self._translate_batch(chunk)))
+            except Exception as e:
+                log_message(
+                    f"Пакетний переклад не вдався ({e}), перекладаю {len(chunk)} рядків поодинці.", level="WARNING"
                 )
+                futures = {IO_EXECUTOR.submit(self._translate_one, t): t for t in chunk}
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result is not None:
+                        fresh[futures[future]] = result
 
-        if not items:
-            if mode == "country":
-                msg = f"Інформацію про міста в країні {query.title()} не знайдено."
-            else:
-                msg = f"Інформацію про цікаві місця в місті {query.title()} не знайдено."
-            items.append({"title": "Немає результатів", "snippet": msg})
+        if self.memory is not None:
+            self.memory.put_many(fresh, self.source, self.target)
+        translated.update(fresh)
+        return [translated.get(t, t) for t in texts]
 
-        return items
 
-    except Exception as e:
-        log_message(f"ERROR: SerpAPI travel пошук провалився: {e}")
-        return [
-            {
-                "title": "Помилка SerpAPI",
-                "snippet": f"Помилка під час пошуку: {e}. Перевірте ключ та ліміти."
-            }
-        ]
+TRANSLATION_MEMORY = TranslationMemory()
+TRANSLATOR = TranslationService(memory=TRANSLATION_MEMORY)
 
 
-class SearchWorker(QThread):
-    """Потік для SerpAPI пошуку."""
+def translate_to_ukrainian(text: str) -> str:
+    """Перекладає англійський текст українською через LibreTranslate API."""
+    return TRANSLATOR.translate(text)
+
+
+def translate_many_to_ukrainian(texts) -> list:
+    """Пакетний переклад списку рядків українською (див. TranslationService)."""
+    return TRANSLATOR.translate_many(texts)
+
+
+# mode -> (шаблон запиту, скільки результатів, заголовок і текст «нічого не знайдено»)
+SERPAPI_QUERIES = {
+    "facts": (
+        "facts and history about {query}",
+        3,
+        "Google Search",
+        "Інформація про {name} не знайдена в результатах пошуку.",
+    ),
+    "travel-city": (
+        "top 7 tourist attractions in {query} with short descriptions",
+        5,
+        "Немає результатів",
+        "Інформацію про цікаві місця в місті {name} не знайдено.",
+    ),
+    "travel-country": (
+        "top 7 cities to visit in {query} with short descriptions",
+        5,
+        "Немає результатів",
+        "Інформацію про міста в країні {name} не знайдено.",
+    ),
+}
 
-    result_ready = pyqtSignal(str)
-    error_occurred = pyqtSignal(str)
 
-    def __init__(self, query: str, lang: str):
-        super().__init__()
-        self.query = query
-        self.preferred_lang = lang
+def _serpapi_get(q: str) -> dict:
+    """Запит до SerpAPI; RuntimeError, якщо API повернув помилку."""
+    params = {
+        "engine": "google",
+        "q": q,
+        "hl": SERPAPI_HL,
+        "gl": SERPAPI_GL,
+        "api_key": SERPAPI_KEY,
+    }
+    results = _PooledGoogleSearch(params).get_dict()
+    error = results.get("error")
+    # «немає результатів» — нормальна відповідь; решта помилок (ключ, ліміти) не кешується
+    if error and "hasn't returned any results" not in error:
+        raise RuntimeError(error)
+    return results
 
-    def run(self):
-        try:
-            log_message(
-                f"AI INFO: Запит до РЕАЛЬНОГО Інтернету (SerpAPI): '{self.query}'"
-            )
 
-            response = google_search_for_info(self.query)
+def _serpapi_raw_items(query: str, mode: str) -> list:
+    """Неперекладені результати SerpAPI: [{"title", "snippet"}, ...]."""
+    template, limit, _, _ = SERPAPI_QUERIES[mode]
+    results = _serpapi_get(template.format(query=query))
+    return [
+        {"title": item.get("title", "No title"), "snippet": item.get("snippet", "No description.")}
+        for item in results.get("organic_results", [])[:limit]
+    ]
 
-            if response and response.strip():
-                log_message(
-                    f"AI SUCCESS: Інформація про {self.query} отримана з SerpAPI."
-                )
-                header = (
-                    "<p style='color:#1abc9c; font-weight:bold;'>🤖 "
-                    "AI-Асистент (WEB-Пошук SerpAPI):</p>"
-                )
-                response_text = header + response
-            else:
-                log_message(f"AI WARNING: Інформацію про '{self.query}' не знайдено.")
-                header = (
-                    "<p style='color:#e74c3c; font-weight:bold;'>Попередження "
-                    "(Не знайдено):</p>"
-                )
-                response_text = (
-                    f"{header}Не вдалося знайти детальної інформації про "
-                    f"{self.query.title()} через SerpAPI."
-                )
 
-            self.result_ready.emit(response_text)
+def _translate_items(items: list) -> list:
+    # усі заголовки й описи — одним запитом на переклад
+    translated = translate_many_to_ukrainian([t for it in items for t in (it["title"], it["snippet"])])
+    return [
+        {"title": translated[2 * i], "snippet": translated[2 * i + 1]} for i in range(len(items))
+    ]
 
-        except Exception as e:
-            log_message(f"AI FATAL ERROR: Критична помилка у потоці пошуку: {e}")
-            self.error_occurred.emit(
-                f"Сталася критична помилка під час виконання запиту з Інтернету: {e}"
-            )
 
+def _not_found_items(query: str, mode: str) -> list:
+    _, _, title, message = SERPAPI_QUERIES[mode]
+    return [{"title": title, "snippet": message.format(name=query.title())}]
 
-class TravelWorker(QThread):
-    """Потік для пошуку travel-ідей (місто/країна)."""
 
-    result_ready = pyqtSignal(str)
-    error_occurred = pyqtSignal(str)
+def iter_serpapi_items(query: str, mode: str):
+    """
+    Результати SerpAPI для поступового показу: генерує (індекс, {"title", "snippet"},
+    перекладено?). Спершу йдуть сирі англійські записи, потім ті ж індекси з
+    перекладом. Кешуються лише сирі результати (свіжий запис віддається одразу,
+    застарілий — одразу + фонове оновлення), а переклад щоразу береться з пам'яті
+    перекладів: невдалий переклад не закріплюється в кеші. Помилки не кешуються.
+    """
+    key = serpapi_cache_key(query, mode)
+    endpoint = "serpapi.search" if mode == "facts" else "serpapi.travel"
+    with request_span(endpoint):
+        raw, fresh = SERPAPI_CACHE.get_stale(key)
+        if raw is not None:
+            mark_cache("hit" if fresh else "stale")
+        else:
+            mark_cache("miss")
+            raw = _serpapi_raw_items(query, mode)
+            SERPAPI_CACHE.set(key, raw)
+            fresh = True
 
-    def __init__(self, query: str, mode: str = "city", parent=None):
-        super().__init__(parent)
-        self.query = query
-        self.mode = mode  # "city" або "country"
+    if not fresh:
+        _serpapi_revalidate(key, lambda: _serpapi_raw_items(query, mode))
 
-    def run(self):
-        try:
-            log_message(
-                f"TRAVEL INFO: Запит travel-ідей ({self.mode}) для '{self.query}'"
-            )
-            items = google_travel_suggestions(self.query, self.mode)
+    if not raw:
+        for i, item in enumerate(_not_found_items(query, mode)):
+            yield i, item, True
+        return
 
-            html = "<p style='color:#0ea5e9; font-weight:bold;'>✈️ Ідеї для подорожі:</p>"
-            html += "<ul>"
-            for it in items:
-                title = it.get("title", "")
-                snip = it.get("snippet", "")
-                html += f"<li><b>{title}</b><br>{snip}</li><br>"
-            html += "</ul>"
+    for i, item in enumerate(raw):
+        yield i, item, False
+    for i, item in enumerate(_translate_items(raw)):
+        yield i, item, True
 
-            self.result_ready.emit(html)
 
-        except Exception as e:
-            log_message(f"TRAVEL FATAL ERROR: {e}")
-            self.error_occurred.emit(
-                f"Сталася критична помилка під час travel-запиту: {e}"
-            )
+def travel_mode_key(mode: str) -> str:
+    return "travel-country" if mode == "country" else "travel-city"
+
+
+PENDING_TRANSLATION_HTML = " <span style='color:#9ca3af;'>(перекладаємо…)</span>"
+
+
+class ResultSection:
+    """
+    Блок результатів у кінці QTextEdit, що наповнюється поступово: кожен
+    елемент можна додати або замінити (сирий текст -> переклад), і блок
+    перемальовується на місці, не чіпаючи попередню історію.
+    """
+
+    def __init__(self, view: QTextEdit, header_html: str, before: str = "", after: str = ""):
+        self.view = view
+        self.header_html = header_html
+        self.before = before
+        self.after = after
+        self.items = {}  # індекс -> html
+        view.append("")
+        cursor = view.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        self.start = cursor.position()
+        self._render()
+
+    def set_item(self, index: int, html: str):
+        self.items[index] = html
+        self._render()
+
+    def _render(self):
+        cursor = QtGui.QTextCursor(self.view.document())
+        cursor.setPosition(self.start)
+        cursor.movePosition(QtGui.QTextCursor.End, QtGui.QTextCursor.KeepAnchor)
+        body = "".join(self.items[i] for i in sorted(self.items))
+        cursor.insertHtml(self.header_html + self.before + body + self.after)
+        bar = self.view.verticalScrollBar()
+        bar.setValue(bar.maximum())
+
+
+def run_serpapi_search(query: str, mode: str, progress, token: CancelToken) -> int:
+    """
+    Задача пулу пошуку: передає кожен результат iter_serpapi_items() як
+    (індекс, item, перекладено?) через progress. Повертає кількість подій.
+    """
+    if not SERPAPI_KEY:
+        log_message("SerpAPI ключ не знайдено.", level="ERROR")
+        raise RuntimeError("❌ SerpAPI ключ не знайдено. Додайте його у змінну SERPAPI_KEY.")
+    count = 0
+    for index, item, translated in iter_serpapi_items(query, mode):
+        progress((index, item, translated))
+        count += 1
+        # перевірка до наступного кроку генератора: скасований пошук не переходить до перекладу
+        if token.cancelled:
+            break
+    return count
+
+
+def submit_serpapi_search(engine: FetchEngine, channel: str, query: str, mode: str,
+                          priority: int = PRIORITY_INTERACTIVE, on_item=None,
+                          on_done=None, on_error=None) -> int:
+    """Поставити SerpAPI-пошук у пул; однакові запити (mode + нормалізований текст) об'єднуються."""
+    return engine.submit(
+        channel, run_serpapi_search, query, mode,
+        on_progress=on_item, on_result=on_done, on_error=on_error,
+        priority=priority, coalesce_key=("serpapi", mode, normalize_query(query)),
+        with_progress=True, with_token=True,
+    )
 
 
 class AICountryInfoDialog(QWidget):
@@ -594,7 +3405,11 @@ class AICountryInfoDialog(QWidget):
         super().__init__(parent)
         self.setWindowTitle("AI Асистент: WEB-Пошук (SerpAPI) 🌐")
         self.resize(650, 550)
-        self.worker = None
+        self.result_section = None
+        self.search_engine = getattr(parent, "search_engine", None) or FetchEngine(
+            SEARCH_MAX_THREADS, parent=self
+        )
+        self._channel = f"ai-search:{id(self)}"
         self._setup_ui()
         self._setup_style()
         self.setWindowFlags(QtCore.Qt.Window)
@@ -667,9 +3482,18 @@ class AICountryInfoDialog(QWidget):
         """
         )
 
+    @staticmethod
+    def format_item(item: dict, translated: bool) -> str:
+        note = "" if translated else PENDING_TRANSLATION_HTML
+        return (
+            f"<b>Джерело:</b> <span style='color:#76a9ff;'>{item['title']}</span>{note}<br>"
+            f"{item['snippet']}<br><br>"
+        )
+
     def send_query(self):
+        """Новий запит скасовує попередній, якщо той ще не завершився."""
         query = self.query_input.text().strip()
-        if not query or (self.worker and self.worker.isRunning()):
+        if not query:
             return
 
         self.chat_history.append(
@@ -678,27 +3502,57 @@ class AICountryInfoDialog(QWidget):
         self.query_input.clear()
 
         self.send_btn.setText("ШІ шукає в Інтернеті... ⏳")
-        self.send_btn.setEnabled(False)
 
-        current_lang = self.parent_app.current_lang if self.parent_app else "uk"
+        log_message(f"AI: Запит до РЕАЛЬНОГО Інтернету (SerpAPI): '{query}'")
+        self.result_section = None
+        submit_serpapi_search(
+            self.search_engine, self._channel, query, "facts",
+            on_item=self.handle_item,
+            on_done=lambda _count: self.handle_done(query),
+            on_error=self.handle_error,
+        )
+
+    def prefetch(self, query: str):
+        """
+        Фоново підготувати відповідь для ймовірного запиту — лише якщо вона вже
+        є в кеші (переклад, за потреби фонове оновлення застарілого запису).
+        Нових платних пошуків відкриття діалогу не запускає.
+        """
+        if query and SERPAPI_KEY and SERPAPI_CACHE.has(serpapi_cache_key(query, "facts")):
+            submit_serpapi_search(
+                self.search_engine, f"prefetch:facts:{normalize_query(query)}", query,
+                "facts", priority=PRIORITY_PREFETCH,
+            )
 
-        self.worker = SearchWorker(query, current_lang)
-        self.worker.result_ready.connect(self.handle_result)
-        self.worker.error_occurred.connect(self.handle_error)
-        self.worker.finished.connect(self.reset_ui)
-        self.worker.start()
+    def handle_item(self, payload):
+        index, item, translated = payload
+        if self.result_section is None:
+            self.result_section = ResultSection(
+                self.chat_history,
+                "<p style='color:#1abc9c; font-weight:bold;'>🤖 "
+                "AI-Асистент (WEB-Пошук SerpAPI):</p>",
+            )
+        self.result_section.set_item(index, self.format_item(item, translated))
 
-    def handle_result(self, result: str):
-        self.chat_history.append(result)
+    def handle_done(self, query: str):
+        log_message(f"AI: Інформація про {query} отримана з SerpAPI.")
+        self.reset_ui()
 
-    def handle_error(self, error: str):
+    def handle_error(self, error):
         self.chat_history.append(
-            f"<p style='color:#e74c3c; font-weight:bold;'>Помилка:</p>{error}"
+            f"<p style='color:#e74c3c; font-weight:bold;'>Помилка:</p>"
+            f"Сталася критична помилка під час виконання запиту з Інтернету: {error}"
         )
+        self.reset_ui()
 
     def reset_ui(self):
         self.send_btn.setText("Надіслати запит")
-        self.send_btn.setEnabled(True)
+
+    def closeEvent(self, event):
+        """Закриття вікна скасовує незавершений запит."""
+        self.search_engine.cancel(self._channel)
+        self.reset_ui()
+        super().closeEvent(event)
 
 
 class TravelIdeasDialog(QWidget):
@@ -708,8 +3562,12 @@ class TravelIdeasDialog(QWidget):
         super().__init__(parent)
         self.setWindowTitle("Ідеї для подорожі ✈️")
         self.resize(700, 550)
-        self.worker = None
+        self.result_section = None
         self.parent_app = parent
+        self.search_engine = getattr(parent, "search_engine", None) or FetchEngine(
+            SEARCH_MAX_THREADS, parent=self
+        )
+        self._channel = f"travel-search:{id(self)}"
         self._setup_ui()
         self._setup_style()
         self.setWindowFlags(QtCore.Qt.Window)
@@ -804,12 +3662,16 @@ class TravelIdeasDialog(QWidget):
         """
         )
 
+    @staticmethod
+    def format_item(item: dict, translated: bool) -> str:
+        note = "" if translated else PENDING_TRANSLATION_HTML
+        return f"<li><b>{item['title']}</b>{note}<br>{item['snippet']}</li><br>"
+
     def start_search(self):
+        """Новий пошук скасовує попередній, якщо той ще не завершився."""
         query = self.query_input.text().strip()
         if not query:
             return
-        if self.worker and self.worker.isRunning():
-            return
 
         mode = self.mode_combo.currentData() or "city"
 
@@ -819,25 +3681,220 @@ class TravelIdeasDialog(QWidget):
         )
 
         self.search_btn.setText("Шукаємо в Інтернеті... ⏳")
-        self.search_btn.setEnabled(False)
 
-        self.worker = TravelWorker(query, mode, parent=self)
-        self.worker.result_ready.connect(self.handle_result)
-        self.worker.error_occurred.connect(self.handle_error)
-        self.worker.finished.connect(self.reset_ui)
-        self.worker.start()
+        log_message(f"TRAVEL: Запит travel-ідей ({mode}) для '{query}'")
+        self.result_section = None
+        submit_serpapi_search(
+            self.search_engine, self._channel, query, travel_mode_key(mode),
+            on_item=self.handle_item,
+            on_done=lambda _count: self.reset_ui(),
+            on_error=self.handle_error,
+        )
+
+    def prefetch(self, query: str, mode: str = "city"):
+        """Фоново підготувати ідеї для ймовірного запиту — лише з кешу (див. AICountryInfoDialog.prefetch)."""
+        mode_key = travel_mode_key(mode)
+        if query and SERPAPI_KEY and SERPAPI_CACHE.has(serpapi_cache_key(query, mode_key)):
+            submit_serpapi_search(
+                self.search_engine, f"prefetch:{mode_key}:{normalize_query(query)}", query,
+                mode_key, priority=PRIORITY_PREFETCH,
+            )
 
-    def handle_result(self, html: str):
-        self.result_view.append(html)
+    def handle_item(self, payload):
+        index, item, translated = payload
+        if self.result_section is None:
+            self.result_section = ResultSection(
+                self.result_view,
+                "<p style='color:#0ea5e9; font-weight:bold;'>✈️ Ідеї для подорожі:</p>",
+                before="<ul>",
+                after="</ul>",
+            )
+        self.result_section.set_item(index, self.format_item(item, translated))
 
-    def handle_error(self, error: str):
+    def handle_error(self, error):
         self.result_view.append(
-            f"<p style='color:#f97373; font-weight:bold;'>Помилка:</p>{error}"
+            f"<p style='color:#f97373; font-weight:bold;'>Помилка:</p>"
+            f"Сталася критична помилка під час travel-запиту: {error}"
         )
+        self.reset_ui()
 
     def reset_ui(self):
         self.search_btn.setText("Знайти місця 🌍")
-        self.search_btn.setEnabled(True)
+
+    def closeEvent(self, event):
+        """Закриття вікна скасовує незавершений пошук."""
+        self.search_engine.cancel(self._channel)
+        self.reset_ui()
+        super().closeEvent(event)
+
+
+def temperature_color(temp) -> str:
+    """Колір погодної мітки на карті за температурою (°C)."""
+    if temp is None:
+        return "#9ca3af"
+    if temp < 0:
+        return "#60a5fa"
+    if temp < 15:
+        return "#34d399"
+    if temp < 25:
+        return "#fbbf24"
+    return "#f87171"
+
+
+class WeatherDashboardDialog(QWidget):
+    """
+    Дашборд поточної погоди для всіх улюблених локацій. Дані приходять
+    поступово (fetch_weather_many у пулі фонових запитів) і одразу
+    з'являються в таблиці; клік по рядку переносить на локацію, а кнопка
+    «На карту» показує температуру й умови мітками на карті.
+    """
+
+    COLUMNS = ("Локація", "°C", "Умови", "Вітер, м/с")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Дашборд улюблених 📊")
+        self.resize(640, 520)
+        self.parent_app = parent
+        self.fetch_engine = getattr(parent, "fetch_engine", None) or FetchEngine(parent=self)
+        self._channel = f"dashboard:{id(self)}"
+        self.places = []
+        self.results = {}
+        self.failed = 0
+        self._learned_ids = {}  # id улюбленого -> id міста OpenWeatherMap
+        self._setup_ui()
+        self.setWindowFlags(QtCore.Qt.Window)
+
+    def _setup_ui(self):
+        main_layout = QVBoxLayout(self)
+
+        header = QLabel("📊 Погода в улюблених локаціях")
+        header.setStyleSheet("font-size:18px; font-weight:bold; color:#0ea5e9;")
+        main_layout.addWidget(header)
+
+        self.status_label = QLabel("")
+        main_layout.addWidget(self.status_label)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table.cellDoubleClicked.connect(self.on_row_activated)
+        main_layout.addWidget(self.table, stretch=1)
+
+        buttons = QHBoxLayout()
+        self.refresh_btn = QPushButton("Оновити 🔄")
+        self.refresh_btn.clicked.connect(self.start)
+        self.map_btn = QPushButton("На карту 🗺️")
+        self.map_btn.clicked.connect(self.show_on_map)
+        buttons.addWidget(self.refresh_btn)
+        buttons.addWidget(self.map_btn)
+        main_layout.addLayout(buttons)
+
+    def start(self):
+        """Заповнити таблицю назвами і запустити отримання погоди для всіх улюблених."""
+        self.places = list(getattr(self.parent_app, "favorites", []))
+        self.results = {}
+        self.failed = 0
+        self.table.setRowCount(len(self.places))
+        for row, place in enumerate(self.places):
+            self.table.setItem(row, 0, QTableWidgetItem(place["name"]))
+            for col in range(1, len(self.COLUMNS)):
+                self.table.setItem(row, col, QTableWidgetItem("…"))
+        if not self.places:
+            self.status_label.setText("Улюблених локацій ще немає — додайте їх кнопкою ⭐.")
+            return
+
+        self.refresh_btn.setEnabled(False)
+        self.update_status()
+        log_message(f"Дашборд: запит погоди для {len(self.places)} улюблених.")
+        self.fetch_engine.submit(
+            self._channel, fetch_weather_many, self.places,
+            on_progress=self.handle_place, on_result=self.handle_done,
+            on_error=self.handle_error, with_token=True,
+        )
+
+    def update_status(self, finished: bool = False):
+        done = len(self.results) + self.failed
+        text = f"Отримано {len(self.results)} з {len(self.places)}"
+        if self.failed:
+            text += f" (помилок: {self.failed})"
+        if not finished and done < len(self.places):
+            text += " ⏳"
+        self.status_label.setText(text)
+
+    def handle_place(self, payload):
+        row, data = payload
+        if row >= len(self.places):
+            return
+        if isinstance(data, Exception):
+            self.failed += 1
+            self.table.item(row, 1).setText("—")
+            self.table.item(row, 2).setText(f"⚠️ {data}")
+            self.table.item(row, 3).setText("—")
+        else:
+            self.results[row] = data
+            lang = getattr(self.parent_app, "current_lang", "uk")
+            temp = (data.get("main") or {}).get("temp")
+            wind = (data.get("wind") or {}).get("speed")
+            condition = (data.get("weather") or [{}])[0]
+            self.table.item(row, 1).setText("—" if temp is None else f"{temp:.0f}")
+            self.table.item(row, 2).setText(describe_condition(condition, lang).capitalize())
+            self.table.item(row, 3).setText("—" if wind is None else f"{wind:.1f}")
+            # id міста з відповіді — наступного разу місце піде пакетним запитом /group
+            place = self.places[row]
+            if data.get("id") and not place.get("owm_id"):
+                place["owm_id"] = data["id"]
+                if place.get("id"):
+                    self._learned_ids[place["id"]] = data["id"]
+        self.update_status()
+
+    def handle_done(self, stats):
+        self.refresh_btn.setEnabled(True)
+        self.update_status(finished=True)
+        log_message(
+            f"Дашборд: погоду отримано для {stats['ok']} місць, помилок: {stats['failed']}."
+        )
+        store = getattr(self.parent_app, "favorites_store", None)
+        if self._learned_ids and store is not None:
+            store.set_owm_ids(self._learned_ids)
+            self._learned_ids = {}
+
+    def handle_error(self, error):
+        self.refresh_btn.setEnabled(True)
+        self.status_label.setText(f"Помилка дашборда: {error}")
+
+    def on_row_activated(self, row, _col):
+        if row < len(self.places) and hasattr(self.parent_app, "set_location"):
+            place = self.places[row]
+            self.parent_app.set_location(place["lat"], place["lon"])
+
+    def show_on_map(self):
+        """Погодні мітки «Назва 12°C, умови» для всіх отриманих локацій."""
+        if not hasattr(self.parent_app, "call_map"):
+            return
+        lang = getattr(self.parent_app, "current_lang", "uk")
+        markers = []
+        for row, data in sorted(self.results.items()):
+            place = self.places[row]
+            temp = (data.get("main") or {}).get("temp")
+            condition = describe_condition((data.get("weather") or [{}])[0], lang)
+            temp_text = "—" if temp is None else f"{temp:.0f}°C"
+            markers.append({
+                "lat": place["lat"], "lon": place["lon"],
+                "label": f"{place['name']} {temp_text}, {condition}",
+                "color": temperature_color(temp),
+            })
+        self.parent_app.call_map("weather_markers", "setWeatherMarkers", markers)
+
+    def closeEvent(self, event):
+        """Закриття вікна скасовує незавершене отримання погоди."""
+        self.fetch_engine.cancel(self._channel)
+        self.refresh_btn.setEnabled(True)
+        super().closeEvent(event)
 
 
 # ---------------- GUI MAIN APPLICATION ----------------
@@ -851,12 +3908,22 @@ class MapWeatherApp(QWidget):
         self.current_lon = DEFAULT_LOCATION[1]
         self.current_lang = "uk"
         self.map_tempfile = MAP_TEMP_FILE
-        self._current_bg_path = BACKGROUND_IMAGES["default"]
+        # сторінка карти завантажується один раз, далі — лише команди через міст
+        self._map_page_requested = False
+        self._map_ready = False
+        self._pending_map_calls = {}  # ключ команди -> (метод mapApi, аргументи)
+        self.map_zoom = DEFAULT_ZOOM
+        self._current_bg_path = BACKGROUNDS.default
+        # останні мовно-незалежні відповіді OpenWeatherMap (для локального рендеру)
+        self.weather_data = None
+        self.forecast_data = None
         self.ai_assistant_dialog = None
         self.travel_dialog = None
+        self.dashboard_dialog = None
 
-        self.settings = {}
+        self.settings_store = SettingsStore(parent=self)
         self.favorites = []
+        self.favorites_index = SpatialIndex([])
 
         self.is_dark_theme = True
         self.auto_theme_enabled = True
@@ -870,9 +3937,36 @@ class MapWeatherApp(QWidget):
         self.marker_a = None   # (lat, lon)
         self.marker_b = None   # (lat, lon)
 
+        # режим маршруту з N точок (подвійний клік додає точку)
+        self.route = RouteMeasurement()
+        self.speed_profiles = SPEED_PROFILES
+
+        # усі мережеві запити головного вікна йдуть через фоновий пул
+        self.fetch_engine = FetchEngine(parent=self)
+        # зміни локації: debounce + злиття в останню ціль + відкидання застарілих відповідей
+        self.refresh_scheduler = RefreshScheduler(self._apply_location, parent=self)
+        # фонове опитування поточної погоди з адаптивним інтервалом
+        self.auto_refresh = AutoRefreshService(
+            self.fetch_engine,
+            location_fn=lambda: (self.current_lat, self.current_lon),
+            on_changed=self.apply_current_weather,
+            is_visible_fn=lambda: self.isVisible() and not self.isMinimized(),
+            parent=self,
+        )
+        # окремий обмежений пул для SerpAPI-пошуку з діалогів (AI, travel)
+        self.search_engine = FetchEngine(
+            SEARCH_MAX_THREADS, parent=self
+        )
+
+        self.favorites_store = FavoritesStore()
         self.load_settings()
         self.load_favorites()
 
+        # локальний кеш тайлів: карта працює й на нестабільному з'єднанні
+        self.tile_server = TileServer(TileCache())
+        if self.tile_server.start() and TILE_SEED_ENABLED:
+            self.tile_server.seed_in_background([(self.current_lat, self.current_lon)])
+
         self.setWindowTitle("Map & Weather Explorer Pro 🗺️🌦️")
         self.resize(1200, 750)
 
@@ -883,81 +3977,121 @@ class MapWeatherApp(QWidget):
 
         self.refresh_favorites_ui()
 
-        self.update_map()
-        self.update_weather_and_background()
+        self.set_location(self.current_lat, self.current_lon, immediate=True)
+        self.auto_refresh.start()
+
+    def changeEvent(self, event):
+        """Згортання / розгортання вікна змінює інтервал фонового оновлення."""
+        if event.type() == QtCore.QEvent.WindowStateChange:
+            self.auto_refresh.reschedule()
+        super().changeEvent(event)
 
     # ---------- SETTINGS & FAVORITES ----------
     def load_settings(self):
         """Завантаження settings.json (мова, тема, локація, авто-тема)."""
-        if os.path.exists(SETTINGS_FILE):
-            try:
-                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-                    self.settings = json.load(f)
-
-                self.current_lang = self.settings.get("lang", self.current_lang)
-                self.is_dark_theme = self.settings.get("dark_theme", self.is_dark_theme)
-                self.auto_theme_enabled = self.settings.get(
-                    "auto_theme", self.auto_theme_enabled
-                )
-
-                lat = self.settings.get("last_lat")
-                lon = self.settings.get("last_lon")
-                if lat is not None and lon is not None:
-                    self.current_lat = lat
-                    self.current_lon = lon
-
-                log_message("INFO: Налаштування успішно завантажені.")
-            except Exception as e:
-                log_message(f"ERROR: Не вдалося завантажити налаштування: {e}")
-                self.settings = {}
-        else:
-            self.settings = {}
-
-    def save_settings(self):
-        """Збереження налаштувань у settings.json."""
-        self.settings["lang"] = self.current_lang
-        self.settings["dark_theme"] = self.is_dark_theme
-        self.settings["auto_theme"] = self.auto_theme_enabled
-        self.settings["last_lat"] = self.current_lat
-        self.settings["last_lon"] = self.current_lon
+        settings = self.settings_store.load()
         try:
-            with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.settings, f, ensure_ascii=False, indent=2)
-            log_message("INFO: Налаштування збережено.")
+            self.current_lang = settings.get("lang", self.current_lang)
+            self.is_dark_theme = settings.get("dark_theme", self.is_dark_theme)
+            self.auto_theme_enabled = settings.get("auto_theme", self.auto_theme_enabled)
+
+            self.speed_profiles = [
+                (name, float(speed))
+                for name, speed in settings.get("speed_profiles", SPEED_PROFILES)
+            ]
+
+            lat = settings.get("last_lat")
+            lon = settings.get("last_lon")
+            if lat is not None and lon is not None:
+                self.current_lat = lat
+                self.current_lon = lon
         except Exception as e:
-            log_message(f"ERROR: Не вдалося зберегти налаштування: {e}")
+            log_message(f"Некоректні налаштування, використовуються типові: {e}", level="ERROR")
 
-    def load_favorites(self):
-        """Завантаження улюблених локацій з favorites.json."""
-        if os.path.exists(FAV_FILE):
-            try:
-                with open(FAV_FILE, "r", encoding="utf-8") as f:
-                    self.favorites = json.load(f)
-                log_message("INFO: Улюблені локації завантажено.")
-            except Exception as e:
-                log_message(f"ERROR: Не вдалося завантажити favorites.json: {e}")
-                self.favorites = []
-        else:
-            self.favorites = []
+    def save_settings(self):
+        """Передати поточний стан у сховище налаштувань (запис на диск — відкладений)."""
+        self.settings_store.update(
+            lang=self.current_lang,
+            dark_theme=self.is_dark_theme,
+            auto_theme=self.auto_theme_enabled,
+            last_lat=self.current_lat,
+            last_lon=self.current_lon,
+        )
 
-    def save_favorites(self):
-        """Збереження улюблених локацій."""
-        try:
-            with open(FAV_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.favorites, f, ensure_ascii=False, indent=2)
-            log_message("INFO: Улюблені локації збережено.")
-        except Exception as e:
-            log_message(f"ERROR: Не вдалося зберегти favorites.json: {e}")
+    def load_favorites(self):
+        """Завантаження улюблених локацій зі сховища SQLite."""
+        self.favorites = self.favorites_store.all()
+        log_message(f"Улюблені локації завантажено ({len(self.favorites)}).")
 
     def refresh_favorites_ui(self):
-        """Оновити комбобокс улюблених локацій."""
+        """Оновити просторовий індекс і список улюблених локацій."""
+        self.favorites_index = SpatialIndex.from_places(self.favorites)
+        self.populate_favorites_combo()
+
+    def populate_favorites_combo(self):
+        """Комбобокс показує до FAVORITES_LIST_LIMIT улюблених, що відповідають пошуку."""
         if not hasattr(self, "fav_combo"):
             return
+        query = self.fav_search.text()
+        if query.strip():
+            shown = self.favorites_store.search(query, FAVORITES_LIST_LIMIT)
+        else:
+            shown = self.favorites[:FAVORITES_LIST_LIMIT]
+        self.fav_combo.blockSignals(True)
         self.fav_combo.clear()
         self.fav_combo.addItem("— Оберіть улюблене місто —", None)
-        for fav in self.favorites:
-            label = f"{fav['name']} ({fav['lat']:.2f}, {fav['lon']:.2f})"
-            self.fav_combo.addItem(label, fav)
+        for fav in shown:
+            self.fav_combo.addItem(self._favorite_label(fav), fav)
+        self.fav_combo.blockSignals(False)
+
+    @staticmethod
+    def _favorite_label(fav: dict) -> str:
+        label = f"{fav['name']} ({fav['lat']:.2f}, {fav['lon']:.2f})"
+        if fav.get("tags"):
+            label += "  " + " ".join(f"#{t}" for t in fav["tags"])
+        return label
+
+    @staticmethod
+    def _favorite_order(fav: dict):
+        """Ключ порядку FavoritesStore.all(): (name_key, id)."""
+        return FavoritesStore.name_key(fav["name"]), fav["id"]
+
+    def insert_favorite(self, fav: dict):
+        """
+        Додати або оновити одне улюблене в списку, просторовому індексі та
+        комбобоксі без перечитування сховища (порядок як у all()).
+        """
+        old_pos = next((i for i, f in enumerate(self.favorites) if f["id"] == fav["id"]), None)
+        if old_pos is not None:
+            # той самий об'єкт уже є payload в індексі — оновлюємо його на місці
+            existing = self.favorites.pop(old_pos)
+            existing.clear()
+            existing.update(fav)
+            fav = existing
+        pos = bisect.bisect_left(
+            self.favorites, self._favorite_order(fav), key=self._favorite_order
+        )
+        self.favorites.insert(pos, fav)
+        if old_pos is None:
+            self.favorites_index.add(fav["lat"], fav["lon"], fav)
+
+        if self.fav_search.text().strip():
+            self.populate_favorites_combo()  # результати пошуку формує запит до сховища
+            return
+        combo = self.fav_combo
+        limit = min(len(self.favorites), FAVORITES_LIST_LIMIT)
+        combo.blockSignals(True)
+        if old_pos is not None and old_pos < FAVORITES_LIST_LIMIT:
+            combo.removeItem(old_pos + 1)
+        if pos < FAVORITES_LIST_LIMIT:
+            combo.insertItem(pos + 1, self._favorite_label(fav), fav)
+        # рядок 0 — підказка; список тримається в межах FAVORITES_LIST_LIMIT
+        while combo.count() - 1 > limit:
+            combo.removeItem(combo.count() - 1)
+        while combo.count() - 1 < limit:
+            extra = self.favorites[combo.count() - 1]
+            combo.addItem(self._favorite_label(extra), extra)
+        combo.blockSignals(False)
 
     # ---------- UI ----------
     def _setup_ui(self):
@@ -966,6 +4100,12 @@ class MapWeatherApp(QWidget):
         self.bg_label.setScaledContents(True)
         self.bg_label.lower()
 
+        # якісне масштабування фону — лише коли resize «заспокоївся»
+        self._bg_settle_timer = QTimer(self)
+        self._bg_settle_timer.setSingleShot(True)
+        self._bg_settle_timer.setInterval(BG_SETTLE_MS)
+        self._bg_settle_timer.timeout.connect(lambda: self.update_background(smooth=True))
+
         # Header label
         self.header_label = QLabel("Weather & Map Explorer")
         self.header_label.setAlignment(QtCore.Qt.AlignLeft)
@@ -979,6 +4119,15 @@ class MapWeatherApp(QWidget):
         self.webview = QWebEngineView()
         self.webview.setMinimumHeight(350)
 
+        # міст подій карти (Leaflet <-> Python)
+        self.map_bridge = MapBridge(self)
+        self.map_channel = QWebChannel(self.webview.page())
+        self.map_channel.registerObject("mapBridge", self.map_bridge)
+        self.webview.page().setWebChannel(self.map_channel)
+
+        self.cursor_label = QLabel("")
+        self.cursor_label.setObjectName("cursor_label")
+
         # Search & controls
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Search city or address (e.g., London, Kyiv)")
@@ -1026,7 +4175,18 @@ class MapWeatherApp(QWidget):
         # Favorites UI
         self.fav_combo = QComboBox()
         self.fav_combo.addItem("— Оберіть улюблене місто —", None)
+        self.fav_search = QLineEdit()
+        self.fav_search.setPlaceholderText("Пошук улюблених: назва або #тег")
         self.add_fav_btn = QPushButton("Додати в улюблені ⭐")
+        self.delete_fav_btn = QPushButton("🗑")
+        self.delete_fav_btn.setToolTip("Видалити вибране улюблене")
+
+        # Route measurement controls
+        self.route_mode_checkbox = QCheckBox("Маршрут 📏")
+        self.route_undo_btn = QPushButton("↩")
+        self.route_undo_btn.setToolTip("Прибрати останню точку маршруту")
+        self.route_clear_btn = QPushButton("✖")
+        self.route_clear_btn.setToolTip("Очистити маршрут")
 
         # Theme controls
         self.auto_theme_checkbox = QCheckBox("Авто-тема за часом доби")
@@ -1044,6 +4204,7 @@ class MapWeatherApp(QWidget):
         self.ai_assistant_btn = QPushButton("AI Асистент (WEB) 🌐")
         self.ai_assistant_btn.setObjectName("ai_assistant_btn")
         self.travel_btn = QPushButton("Ідеї для подорожі ✈️")
+        self.dashboard_btn = QPushButton("Дашборд улюблених 📊")
 
         top_layout = QVBoxLayout()
 
@@ -1063,6 +4224,7 @@ class MapWeatherApp(QWidget):
         left_layout = QVBoxLayout()
         left_layout.addLayout(top_layout)
         left_layout.addWidget(self.webview)
+        left_layout.addWidget(self.cursor_label)
         left_frame = QFrame()
         left_frame.setLayout(left_layout)
         left_frame.setObjectName("left_panel")
@@ -1073,8 +4235,12 @@ class MapWeatherApp(QWidget):
         right_layout.addWidget(self.lang_selector)
         right_layout.addSpacing(10)
 
+        right_layout.addWidget(self.fav_search)
         right_layout.addWidget(self.fav_combo)
-        right_layout.addWidget(self.add_fav_btn)
+        fav_buttons_row = QHBoxLayout()
+        fav_buttons_row.addWidget(self.add_fav_btn, stretch=1)
+        fav_buttons_row.addWidget(self.delete_fav_btn)
+        right_layout.addLayout(fav_buttons_row)
         right_layout.addSpacing(10)
 
         right_layout.addWidget(QLabel("--- Current Weather Status ---"))
@@ -1095,6 +4261,12 @@ class MapWeatherApp(QWidget):
         right_layout.addSpacing(10)
         right_layout.addWidget(QLabel("--- Route distance (дві мітки) ---"))
 
+        route_row = QHBoxLayout()
+        route_row.addWidget(self.route_mode_checkbox)
+        route_row.addWidget(self.route_undo_btn)
+        route_row.addWidget(self.route_clear_btn)
+        right_layout.addLayout(route_row)
+
         self.distance_label = QLabel("Відстань між мітками: —")
         self.distance_label.setObjectName("distance_label")
         self.distance_label.setWordWrap(True)
@@ -1107,6 +4279,7 @@ class MapWeatherApp(QWidget):
 
         right_layout.addWidget(self.ai_assistant_btn)
         right_layout.addWidget(self.travel_btn)
+        right_layout.addWidget(self.dashboard_btn)
         right_layout.addWidget(self.refresh_btn)
         right_layout.addWidget(self.open_browser_btn)
         right_layout.addWidget(self.resize_map_btn)
@@ -1594,15 +4767,27 @@ class MapWeatherApp(QWidget):
         self.ai_assistant_btn.clicked.connect(self.on_ai_assistant)
         self.export_btn.clicked.connect(self.on_export_report)
         self.travel_btn.clicked.connect(self.on_travel_ideas)
+        self.dashboard_btn.clicked.connect(self.on_dashboard)
         self.panel_toggle_btn.clicked.connect(self.on_toggle_panel)
 
         self.theme_toggle_btn.clicked.connect(self.on_toggle_theme)
         self.auto_theme_checkbox.toggled.connect(self.on_auto_theme_toggled)
 
         self.add_fav_btn.clicked.connect(self.on_add_favorite)
+        self.delete_fav_btn.clicked.connect(self.on_delete_favorite)
+        self.fav_search.textChanged.connect(lambda _text: self.populate_favorites_combo())
+
+        self.route_mode_checkbox.toggled.connect(self.on_route_mode_toggled)
+        self.route_undo_btn.clicked.connect(self.on_route_undo)
+        self.route_clear_btn.clicked.connect(self.on_route_clear)
         self.fav_combo.currentIndexChanged.connect(self.on_favorite_selected)
 
-        self.webview.titleChanged.connect(self.on_map_title_changed)
+        self.webview.loadFinished.connect(self._on_map_load_finished)
+        self.map_bridge.ready.connect(self._on_map_bridge_ready)
+        self.map_bridge.double_clicked.connect(self.handle_map_double_click)
+        self.map_bridge.marker_dragged.connect(self.on_map_marker_dragged)
+        self.map_bridge.view_changed.connect(self.on_map_view_changed)
+        self.map_bridge.mouse_moved.connect(self.on_map_mouse_moved)
 
     # ---------- AUTO THEME ----------
     def apply_theme_by_time(self):
@@ -1618,7 +4803,7 @@ class MapWeatherApp(QWidget):
                 self._apply_dark_theme_styles()
             else:
                 self._apply_light_theme_styles()
-            log_message(f"INFO: Авто-тема змінена за часом доби (hour={hour}).")
+            log_message(f"Авто-тема змінена за часом доби (hour={hour}).")
 
     def on_auto_theme_toggled(self, checked: bool):
         """Увімкнення / вимкнення авто-теми."""
@@ -1628,7 +4813,7 @@ class MapWeatherApp(QWidget):
             self.apply_theme_by_time()
         else:
             self.theme_timer.stop()
-            log_message("INFO: Авто-тема вимкнена користувачем.")
+            log_message("Авто-тема вимкнена користувачем.")
 
     def on_toggle_theme(self):
         """Ручний перемикач теми. Вимикає авто-тему."""
@@ -1693,34 +4878,30 @@ class MapWeatherApp(QWidget):
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.bg_label.resize(self.size())
+        if not hasattr(self, "_bg_settle_timer"):
+            return
 
-        if self._current_bg_path and os.path.exists(self._current_bg_path):
-            pix = QtGui.QPixmap(self._current_bg_path)
-            if pix.isNull():
-                log_message(
-                    f"ERROR: QPixmap не змогла завантажити файл: {self._current_bg_path}."
-                )
-                return
-            pix = pix.scaled(
-                self.size(),
-                QtCore.Qt.KeepAspectRatioByExpanding,
-                QtCore.Qt.SmoothTransformation,
-            )
+        # під час живого resize — швидке масштабування, якісне — після паузи
+        self.update_background(smooth=False)
+        self._bg_settle_timer.start()
+
+    def update_background(self, smooth: bool = True):
+        """Показати поточний фон, відмасштабований під розмір вікна."""
+        if not self._current_bg_path:
+            return
+        pix = BACKGROUNDS.scaled(self._current_bg_path, self.size(), smooth)
+        if pix is not None:
             self.bg_label.setPixmap(pix)
-            log_message(f"INFO: Фон оновлено з файлу: {self._current_bg_path}")
-        elif self._current_bg_path:
-            log_message(
-                f"ERROR: Файл фону не існує за шляхом: {self._current_bg_path}"
-            )
 
     # ---------- MAP & WEATHER ----------
-    def update_map(self):
-        """Перемальовує карту з мітками A/B (якщо є)."""
+    def _map_extra_markers(self):
+        """Мітки A/B у форматі для build_folium_map / mapApi.setExtraMarkers."""
         extra_markers = []
 
         if self.marker_a is not None:
             extra_markers.append(
                 {
+                    "id": "A",
                     "lat": self.marker_a[0],
                     "lon": self.marker_a[1],
                     "tooltip": "Мітка A",
@@ -1731,6 +4912,7 @@ class MapWeatherApp(QWidget):
         if self.marker_b is not None:
             extra_markers.append(
                 {
+                    "id": "B",
                     "lat": self.marker_b[0],
                     "lon": self.marker_b[1],
                     "tooltip": "Мітка B",
@@ -1738,14 +4920,72 @@ class MapWeatherApp(QWidget):
                 }
             )
 
-        m = build_folium_map(
+        return extra_markers
+
+    def _build_current_map(self):
+        return build_folium_map(
             self.current_lat,
             self.current_lon,
-            extra_markers=extra_markers,
+            zoom=self.map_zoom,
+            extra_markers=self._map_extra_markers(),
+            tile_server=self.tile_server,
+            route=self.route.points,
         )
-        save_map_html(m, self.map_tempfile)
+
+    def _load_map_page(self):
+        """Повне завантаження сторінки карти (лише при старті або після збою)."""
+        self._map_page_requested = True
+        self._map_ready = False
+        save_map_html(self._build_current_map(), self.map_tempfile)
         self.webview.load(QtCore.QUrl.fromLocalFile(self.map_tempfile))
 
+    def _on_map_load_finished(self, ok: bool):
+        if not ok:
+            log_message("Не вдалося завантажити сторінку карти.", level="ERROR")
+            self._map_page_requested = False
+
+    def _on_map_bridge_ready(self):
+        """JS-сторона підключилася до QWebChannel — виконуємо відкладені команди."""
+        self._map_ready = True
+        self.map_bridge.send("setMouseMoveStreaming", True)
+        pending, self._pending_map_calls = self._pending_map_calls, {}
+        for method, args in pending.values():
+            self.map_bridge.send(method, *args)
+
+    def call_map(self, key: str, method: str, *args):
+        """
+        Викликати window.mapApi[method](*args) на сторінці карти. Поки міст
+        не готовий, виклики відкладаються; з однаковим ключем — лише останній.
+        """
+        if self._map_ready:
+            self.map_bridge.send(method, *args)
+        else:
+            self._pending_map_calls.pop(key, None)
+            self._pending_map_calls[key] = (method, args)
+
+    def update_map(self):
+        """Перецентрувати карту на поточну локацію та оновити мітки (без перезавантаження)."""
+        if not self._map_page_requested:
+            self._load_map_page()
+            return
+        lat, lon = self.current_lat, self.current_lon
+        self.call_map("view", "setView", lat, lon)
+        self.call_map("main_marker", "setMainMarker", lat, lon)
+        self.update_map_markers()
+
+    def update_map_markers(self):
+        """Оновити лише мітки A/B, не змінюючи центр і масштаб карти."""
+        if not self._map_page_requested:
+            self._load_map_page()
+            return
+        self.call_map("extra_markers", "setExtraMarkers", self._map_extra_markers())
+
+    def on_map_view_changed(self, lat: float, lon: float, zoom: int):
+        self.map_zoom = zoom
+
+    def on_map_mouse_moved(self, lat: float, lon: float):
+        self.cursor_label.setText(f"🖱 {lat:.5f}, {lon:.5f}")
+
     def update_forecast_ui(self, forecast_data: dict):
         """Оновлення текстового блоку прогнозу на 3 дні."""
         try:
@@ -1762,7 +5002,7 @@ class MapWeatherApp(QWidget):
 
                 main = item.get("main", {})
                 weather = (item.get("weather") or [{}])[0]
-                desc = weather.get("description", "—").capitalize()
+                desc = describe_condition(weather, self.current_lang).capitalize()
                 temp = main.get("temp")
 
                 pretty_date = datetime.strptime(
@@ -1775,7 +5015,7 @@ class MapWeatherApp(QWidget):
 
             self.forecast_text.setText("\n".join(lines) if lines else "—")
         except Exception as e:
-            log_message(f"ERROR: Не вдалося оновити UI прогнозу: {e}")
+            log_message(f"Не вдалося оновити UI прогнозу: {e}", level="ERROR")
             self.forecast_text.setText("Не вдалося завантажити прогноз.")
 
     def update_forecast_graph(self, forecast_data: dict):
@@ -1800,49 +5040,126 @@ class MapWeatherApp(QWidget):
             self.forecast_plot.plot(x, temps, pen=pg.mkPen(width=2))
 
         except Exception as e:
-            log_message(f"ERROR: Не вдалося оновити графік прогнозу: {e}")
+            log_message(f"Не вдалося оновити графік прогнозу: {e}", level="ERROR")
 
-    def update_weather_and_background(self):
-        """Оновити погоду, фон, прогноз і графік для поточної локації."""
-        try:
-            data = fetch_weather(
-                self.current_lat, self.current_lon, OPENWEATHERMAP_API_KEY, self.current_lang
+    def set_location(self, lat: float, lon: float, immediate: bool = False):
+        """
+        Вибрати нову поточну локацію. Карта й погода оновлюються через
+        RefreshScheduler: серія швидких змін коштує одного оновлення.
+        """
+        self.current_lat, self.current_lon = lat, lon
+        # відповідь для попередньої локації вже не потрібна
+        self.fetch_engine.cancel("weather")
+        self.auto_refresh.cancel_poll()
+        self.refresh_scheduler.request(lat, lon, immediate=immediate)
+
+    def _apply_location(self, lat: float, lon: float, generation: int):
+        log_message(f"Оновлення для локації ({lat}, {lon}), покоління #{generation}.")
+        self.update_map()
+        self.update_weather_and_background(generation)
+
+    def update_weather_and_background(self, generation=None):
+        """Запустити фонове завантаження погоди та прогнозу для поточної локації."""
+        lat, lon = self.current_lat, self.current_lon
+        if generation is None:
+            generation = self.refresh_scheduler.generation
+
+        def load(progress, token):
+            # кожна частина відмальовується одразу, як тільки надійде;
+            # дані мовно-незалежні — мова застосовується лише при рендері
+            return fetch_weather_bundle(
+                lat, lon, on_part=lambda kind, data: progress((kind, data)), token=token
             )
-            summary, desc, temp = weather_summary_text(data, self.current_lang)
 
-            self.info_label.setText(summary)
-            self.temp_label.setText(f"{temp:.0f}°C" if temp is not None else "—°C")
-            self.desc_label.setText(desc.capitalize() if desc else "")
+        def current(callback):
+            # відповідь для локації, яку вже замінила новіша, не відмальовується
+            def guarded(payload):
+                if self.refresh_scheduler.is_current(generation):
+                    callback(payload)
+                else:
+                    log_message(f"Відкинуто застарілу відповідь погоди (покоління #{generation}).")
+            return guarded
+
+        self.refresh_btn.setText("Оновлення... ⏳")
+        self.fetch_engine.submit(
+            "weather",
+            load,
+            on_result=current(self._on_weather_loaded),
+            on_error=current(self._on_weather_failed),
+            on_progress=current(self._on_weather_part),
+            with_token=True,
+        )
 
-            bg = choose_background_by_description(desc)
-            if bg:
-                self._current_bg_path = bg
-                self.resizeEvent(QtGui.QResizeEvent(self.size(), self.size()))
+    def _on_weather_part(self, part):
+        """Відмалювати частину пакета (погода або прогноз), що надійшла першою."""
+        kind, data = part
+        if kind == "weather":
+            self.apply_current_weather(data)
+        else:
+            self.apply_forecast(data)
 
-            forecast = fetch_forecast(
-                self.current_lat, self.current_lon, OPENWEATHERMAP_API_KEY, self.current_lang
-            )
-            if forecast:
-                self.update_forecast_ui(forecast)
-                self.update_forecast_graph(forecast)
-            else:
-                self.forecast_text.setText("Не вдалося завантажити прогноз.")
-                if HAS_PG and self.forecast_plot is not None:
-                    self.forecast_plot.clear()
+    def _on_weather_loaded(self, bundle: dict):
+        """Обидві частини отримано — зберігаємо налаштування і перезапускаємо автооновлення."""
+        self.refresh_btn.setText("Refresh Weather 🔄")
+        self.save_settings()
+        self.auto_refresh.reset()
 
-            self.save_settings()
+    def apply_current_weather(self, data: dict):
+        """Запам'ятати нову погоду, відмалювати її та оновити фон (GUI-потік)."""
+        self.weather_data = data
+        self.auto_refresh.note_rendered(data)
+        try:
+            self.render_current_weather()
 
-        except ConnectionError as e:
-            self.info_label.setText(f"Помилка з'єднання: {e}")
-            log_message(f"ERROR: {e}")
+            condition = (data.get("weather") or [{}])[0]
+            bg = choose_background_by_description(describe_condition(condition, "en"))
+            if bg and bg != self._current_bg_path:
+                self._current_bg_path = bg
+                self.update_background()
+                log_message(f"Фон оновлено з файлу: {bg}")
         except Exception as e:
             self.info_label.setText(f"Загальна помилка: {e}")
-            log_message(f"FATAL: Непередбачена помилка: {e}")
+            log_message(f"Непередбачена помилка: {e}", level="FATAL")
+
+    def render_current_weather(self):
+        """Відмалювати поточну погоду поточною мовою без мережевих запитів."""
+        if not self.weather_data:
+            return
+        summary, desc, temp = weather_summary_text(self.weather_data, self.current_lang)
+
+        self.info_label.setText(summary)
+        self.temp_label.setText(f"{temp:.0f}°C" if temp is not None else "—°C")
+        self.desc_label.setText(desc.capitalize() if desc else "")
+
+    def apply_forecast(self, forecast):
+        """Оновити текст і графік прогнозу (None — прогноз недоступний)."""
+        self.forecast_data = forecast
+        if forecast:
+            self.update_forecast_ui(forecast)
+            self.update_forecast_graph(forecast)
+        else:
+            self.forecast_text.setText("Не вдалося завантажити прогноз.")
+            if HAS_PG and self.forecast_plot is not None:
+                self.forecast_plot.clear()
+
+    def _on_weather_failed(self, error: Exception):
+        self.refresh_btn.setText("Refresh Weather 🔄")
+        # опитування могло бути скасоване разом зі зміною локації — не даємо йому зупинитись
+        self.auto_refresh.reschedule()
+        if isinstance(error, ConnectionError):
+            self.info_label.setText(f"Помилка з'єднання: {error}")
+            log_message(f"{error}", level="ERROR")
+        else:
+            self.info_label.setText(f"Загальна помилка: {error}")
+            log_message(f"Непередбачена помилка: {error}", level="FATAL")
 
     # ---------- ACTIONS ----------
     def on_refresh(self):
         log_message("ACTION: Оновлення погоди.")
-        self.update_weather_and_background()
+        if self.refresh_scheduler.pending:
+            self.refresh_scheduler.flush()
+        else:
+            self.update_weather_and_background()
 
     def on_search(self):
         query = self.search_input.text().strip()
@@ -1852,43 +5169,62 @@ class MapWeatherApp(QWidget):
         self.search_btn.setEnabled(False)
         self.search_btn.setText("Шукаємо...")
 
-        res = geocode_address(query)
+        self.fetch_engine.submit(
+            "geocode",
+            geocode_address,
+            query,
+            on_result=self._on_geocode_result,
+            on_error=lambda e: self._on_geocode_result(None),
+        )
 
+    def _on_geocode_result(self, res):
         self.search_btn.setEnabled(True)
         self.search_btn.setText("Search 🔍")
 
         if res:
-            self.current_lat, self.current_lon, _ = res
-            self.update_map()
-            self.update_weather_and_background()
+            lat, lon, _ = res
+            self.set_location(lat, lon)
         else:
             QMessageBox.warning(
                 self, "Not Found", "Не вдалося знайти місце за вашим запитом."
             )
 
     def on_use_my_location(self):
-        try:
-            r = requests.get(IP_API_URL, timeout=8).json()
-            if r.get("status") == "success":
-                self.current_lat, self.current_lon = r.get("lat"), r.get("lon")
-                self.update_map()
-                self.update_weather_and_background()
-            else:
-                raise Exception("Не вдалося отримати координати.")
-        except Exception:
-            QMessageBox.warning(
-                self,
-                "Error",
-                "Не вдалося отримати поточне місцезнаходження за IP.",
-            )
+        self.loc_btn.setEnabled(False)
+        self.fetch_engine.submit(
+            "ip_location",
+            fetch_ip_location,
+            on_result=self._on_ip_location,
+            on_error=self._on_ip_location_failed,
+        )
+
+    def _on_ip_location(self, coords):
+        self.loc_btn.setEnabled(True)
+        self.set_location(*coords)
+
+    def _on_ip_location_failed(self, error: Exception):
+        self.loc_btn.setEnabled(True)
+        QMessageBox.warning(
+            self,
+            "Error",
+            "Не вдалося отримати поточне місцезнаходження за IP.",
+        )
 
     def open_map_in_browser(self):
+        # файл карти оновлюється лише при повному завантаженні — зберігаємо актуальний стан
+        save_map_html(self._build_current_map(), self.map_tempfile)
         if os.path.exists(self.map_tempfile):
             webbrowser.open(f"file:///{self.map_tempfile}")
 
     def on_lang_change(self, idx):
+        """Перемикання мови: локальний ре-рендер збережених даних, без мережі."""
         self.current_lang = self.lang_selector.currentData()
-        self.update_weather_and_background()
+        try:
+            self.render_current_weather()
+            if self.forecast_data:
+                self.update_forecast_ui(self.forecast_data)
+        except Exception as e:
+            log_message(f"Не вдалося перемалювати погоду після зміни мови: {e}", level="ERROR")
 
     def on_resize_map(self):
         w, ok1 = QInputDialog.getInt(
@@ -1926,12 +5262,17 @@ class MapWeatherApp(QWidget):
         )
         if path:
             self._current_bg_path = path
-            self.resizeEvent(QtGui.QResizeEvent(self.size(), self.size()))
+            self.update_background()
+
+    def current_place_name(self):
+        """Назва поточного місця з останньої відповіді OpenWeatherMap (або None)."""
+        return (self.weather_data or {}).get("name") or None
 
     def on_ai_assistant(self):
         """Відкриває діалогове вікно AI-асистента."""
         if self.ai_assistant_dialog is None:
             self.ai_assistant_dialog = AICountryInfoDialog(parent=self)
+        self.ai_assistant_dialog.prefetch(self.current_place_name())
         self.ai_assistant_dialog.show()
         self.ai_assistant_dialog.raise_()
         self.ai_assistant_dialog.activateWindow()
@@ -1940,10 +5281,20 @@ class MapWeatherApp(QWidget):
         """Відкрити діалог з ідеями для подорожей."""
         if self.travel_dialog is None:
             self.travel_dialog = TravelIdeasDialog(parent=self)
+        self.travel_dialog.prefetch(self.current_place_name(), "city")
         self.travel_dialog.show()
         self.travel_dialog.raise_()
         self.travel_dialog.activateWindow()
 
+    def on_dashboard(self):
+        """Відкрити дашборд погоди для всіх улюблених локацій."""
+        if self.dashboard_dialog is None:
+            self.dashboard_dialog = WeatherDashboardDialog(parent=self)
+        self.dashboard_dialog.start()
+        self.dashboard_dialog.show()
+        self.dashboard_dialog.raise_()
+        self.dashboard_dialog.activateWindow()
+
     def on_export_report(self):
         """Експортувати звіт про погоду + прогноз у TXT / HTML."""
         path, _ = QFileDialog.getSaveFileName(
@@ -1982,57 +5333,64 @@ class MapWeatherApp(QWidget):
     # ---------- FAVORITES ----------
     def on_add_favorite(self):
         """Додати поточну локацію в улюблені."""
-        name, ok = QInputDialog.getText(
+        text, ok = QInputDialog.getText(
             self,
             "Нове улюблене",
-            "Введіть назву для цієї локації (наприклад: Київ дім):",
+            "Введіть назву для цієї локації (наприклад: Київ дім #робота):",
         )
-        if not ok or not name.strip():
+        if not ok:
+            return
+        words = text.split()
+        name = " ".join(w for w in words if not w.startswith("#"))
+        tags = [w for w in words if w.startswith("#")]
+        if not name:
             return
 
-        fav = {"name": name.strip(), "lat": self.current_lat, "lon": self.current_lon}
-        self.favorites.append(fav)
-        self.save_favorites()
-        self.refresh_favorites_ui()
-        QMessageBox.information(self, "Готово", "Локацію додано в улюблені ⭐")
+        # без #тегів у назві теги наявного запису зберігаються
+        fav, created = self.favorites_store.add(
+            name, self.current_lat, self.current_lon, tags or None
+        )
+        if fav is None:
+            QMessageBox.warning(self, "Помилка", "Не вдалося зберегти улюблене.")
+            return
+        self.insert_favorite(fav)
+        if created:
+            QMessageBox.information(self, "Готово", "Локацію додано в улюблені ⭐")
+        else:
+            QMessageBox.information(self, "Готово", "Ця точка вже була в улюблених — запис оновлено.")
+
+    def on_delete_favorite(self):
+        """Видалити вибране в комбобоксі улюблене."""
+        fav = self.fav_combo.currentData()
+        if not fav:
+            return
+        answer = QMessageBox.question(self, "Видалення", f"Видалити «{fav['name']}» з улюблених?")
+        if answer != QMessageBox.Yes:
+            return
+        if self.favorites_store.remove(fav["id"]):
+            self.favorites = [f for f in self.favorites if f["id"] != fav["id"]]
+            self.refresh_favorites_ui()
 
     def on_favorite_selected(self, idx):
         data = self.fav_combo.itemData(idx)
         if not data:
             return
-        self.current_lat = data["lat"]
-        self.current_lon = data["lon"]
-        self.update_map()
-        self.update_weather_and_background()
+        self.set_location(data["lat"], data["lon"])
 
     # ---------- MAP DOUBLE CLICK HANDLING ----------
-    def on_map_title_changed(self, title: str):
-        """
-        Ловить зміни заголовка сторінки.
-        Формат: 'MAP_DBLCLICK:lat,lon'
-        """
-        if not title.startswith("MAP_DBLCLICK:"):
-            return
-
-        try:
-            coords_str = title.split("MAP_DBLCLICK:")[1]
-            lat_str, lon_str = coords_str.split(",")
-            lat = float(lat_str)
-            lon = float(lon_str)
-        except Exception as e:
-            log_message(f"ERROR: Не вдалося розпарсити координати з title '{title}': {e}")
-            return
-
-        log_message(f"MAP CLICK: Отримано подвійний клік на координатах ({lat}, {lon})")
-        self.handle_map_double_click(lat, lon)
-
     def handle_map_double_click(self, lat: float, lon: float):
         """
         Логіка постановки двох міток:
         1-й подвійний клік — ставить мітку A.
         2-й подвійний клік — ставить мітку B і рахує відстань.
         3-й та далі — починають цикл заново, перезаписуючи мітку A.
+        У режимі маршруту кожен подвійний клік додає точку маршруту.
         """
+        log_message(f"MAP CLICK: Отримано подвійний клік на координатах ({lat}, {lon})")
+
+        if self.route_mode_checkbox.isChecked():
+            self.add_route_point(lat, lon)
+            return
 
         if self.marker_a is None and self.marker_b is None:
             self.marker_a = (lat, lon)
@@ -2044,48 +5402,136 @@ class MapWeatherApp(QWidget):
 
         elif self.marker_a is not None and self.marker_b is None:
             self.marker_b = (lat, lon)
+            self.show_ab_distance()
 
-            d_m, d_km = haversine_distance(
-                self.marker_a[0],
-                self.marker_a[1],
-                self.marker_b[0],
-                self.marker_b[1],
+        else:
+            self.marker_a = (lat, lon)
+            self.marker_b = None
+            self.distance_label.setText(
+                "Мітку B скинуто.\n"
+                "Нова мітка A встановлена. Зробіть подвійний клік для мітки B."
             )
 
-            walk_time = format_travel_time(d_km, 5.0)
-            car_time = format_travel_time(d_km, 50.0)
+        self.append_nearby_favorites(lat, lon)
+        self.update_map_markers()
+
+    def nearby_favorites_text(self, lat: float, lon: float) -> str:
+        """Найближчі улюблені та їх кількість у радіусі NEARBY_FAVORITES_RADIUS_KM."""
+        if not len(self.favorites_index):
+            return ""
+        nearest = self.favorites_index.nearest(lat, lon, NEARBY_FAVORITES_COUNT)
+        in_radius = len(self.favorites_index.within(lat, lon, NEARBY_FAVORITES_RADIUS_KM))
+        lines = [f"{fav['name']} — {d_km:.1f} км" for d_km, fav in nearest]
+        return (
+            "\n\nНайближчі улюблені:\n" + "\n".join(lines)
+            + f"\nУ радіусі {NEARBY_FAVORITES_RADIUS_KM} км: {in_radius}"
+        )
 
-            text = (
-                f"Мітка A: ({self.marker_a[0]:.5f}, {self.marker_a[1]:.5f})\n"
-                f"Мітка B: ({self.marker_b[0]:.5f}, {self.marker_b[1]:.5f})\n\n"
-                f"Відстань: {d_m:,.0f} м (~{d_km:.2f} км)\n"
-                f"Пішки (~5 км/год): {walk_time}\n"
-                f"Авто (~50 км/год): {car_time}"
-            )
+    def append_nearby_favorites(self, lat: float, lon: float):
+        self.distance_label.setText(
+            self.distance_label.text() + self.nearby_favorites_text(lat, lon)
+        )
+
+    def show_ab_distance(self):
+        """Порахувати та показати відстань між мітками A і B."""
+        d_m, d_km = haversine_distance(
+            self.marker_a[0],
+            self.marker_a[1],
+            self.marker_b[0],
+            self.marker_b[1],
+        )
+
+        text = (
+            f"Мітка A: ({self.marker_a[0]:.5f}, {self.marker_a[1]:.5f})\n"
+            f"Мітка B: ({self.marker_b[0]:.5f}, {self.marker_b[1]:.5f})\n\n"
+            f"Відстань: {d_m:,.0f} м (~{d_km:.2f} км)\n"
+            + "\n".join(format_profile_times(d_km, self.speed_profiles))
+        )
 
-            self.distance_label.setText(text)
-            log_message(f"DISTANCE: {d_m:.0f} м (~{d_km:.2f} км) між A та B.")
+        self.distance_label.setText(text)
+        log_message(f"DISTANCE: {d_m:.0f} м (~{d_km:.2f} км) між A та B.")
 
+    # ---------- ROUTE MEASUREMENT ----------
+    def on_route_mode_toggled(self, enabled: bool):
+        if enabled:
+            self.show_route_summary()
         else:
-            self.marker_a = (lat, lon)
-            self.marker_b = None
+            self.distance_label.setText("Відстань між мітками: —")
+
+    def add_route_point(self, lat: float, lon: float):
+        """Додати точку маршруту: O(1) перерахунок і одна JS-команда замість перезавантаження карти."""
+        self.route.add(lat, lon)
+        self._sync_route("addRoutePoint", lat, lon)
+        self.show_route_summary()
+
+    def on_route_undo(self):
+        if self.route.undo() is not None:
+            self._sync_route("removeLastRoutePoint")
+            self.show_route_summary()
+
+    def on_route_clear(self):
+        self.route.clear()
+        self._sync_route("setRoute", [])
+        self.show_route_summary()
+
+    def _sync_route(self, method: str, *args):
+        """Інкрементна команда, якщо карта готова; інакше — відкладена повна заміна маршруту."""
+        if self._map_ready:
+            self.map_bridge.send(method, *args)
+        else:
+            self.call_map("route", "setRoute", [list(p) for p in self.route.points])
+
+    def show_route_summary(self):
+        """Останній відрізок і весь маршрут з часом для кожного профілю швидкості."""
+        count = len(self.route)
+        if count == 0:
             self.distance_label.setText(
-                "Мітку B скинуто.\n"
-                "Нова мітка A встановлена. Зробіть подвійний клік для мітки B."
+                "Маршрут порожній.\nПодвійний клік на карті додає точку."
             )
+            return
 
-        self.update_map()
+        lines = [f"Точок у маршруті: {count}"]
+        if count > 1:
+            seg_km = self.route.segment_m(count - 1) / 1000.0
+            total_km = self.route.total_m / 1000.0
+            lines.append(f"\nОстанній відрізок: {seg_km:.2f} км")
+            lines += format_profile_times(seg_km, self.speed_profiles)
+            lines.append(f"\nЗагалом: {total_km:.2f} км")
+            lines += format_profile_times(total_km, self.speed_profiles)
+        self.distance_label.setText("\n".join(lines))
+
+    def on_map_marker_dragged(self, marker_id: str, lat: float, lon: float):
+        """Мітку A або B перетягнули на карті — перераховуємо відстань."""
+        if marker_id == "A":
+            self.marker_a = (lat, lon)
+        elif marker_id == "B":
+            self.marker_b = (lat, lon)
+        else:
+            return
+        if self.marker_a is not None and self.marker_b is not None:
+            self.show_ab_distance()
+            self.append_nearby_favorites(lat, lon)
 
     # ---------- CLOSE ----------
     def closeEvent(self, event):
-        """При закритті – зберігаємо налаштування."""
+        """При закритті – зупиняємо фонові запити та зберігаємо налаштування."""
+        self.refresh_scheduler.cancel()
+        self.auto_refresh.stop()
+        shutdown_engines([self.fetch_engine, self.search_engine])
+        self.tile_server.stop()
+        HTTP.log_stats()
+        TRANSLATION_MEMORY.log_stats()
+        TRANSLATION_MEMORY.close()
+        self.favorites_store.close()
+        save_persistent_caches()
         self.save_settings()
+        self.settings_store.flush()
         super().closeEvent(event)
 
 
 # ---------------- MAIN EXECUTION ----------------
 def main():
-    log_message("INFO: Запуск програми.")
+    log_message("Запуск програми.")
 
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
@@ -2102,4 +5548,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if "--request-stats" in sys.argv:
+        # python dis-v6.py --request-stats [шлях до requests.jsonl]
+        idx = sys.argv.index("--request-stats")
+        print_request_stats(sys.argv[idx + 1] if len(sys.argv) > idx + 1 else TELEMETRY_FILE)
+    else:
+        main()